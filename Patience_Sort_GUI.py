@@ -1,39 +1,97 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
+import functools
+import math
+import operator
+import os
+import sys
 import time
 import threading
+import queue
 from typing import List, Optional
 import random
 
+from patience_engine import (
+    LDSWorker, PatienceSortEngine, PerfCounters, StepEvent, TraceCache, TraceWorker, WorkerEvent, format_bytes,
+    STAGE_LOAD, STAGE_LOADED, STAGE_PLACE, STAGE_MERGE, STAGE_LDS, STAGE_DONE, STAGE_ERROR,
+    PHASE_HIGHLIGHT, PHASE_FIND_PILE, PHASE_PLACE,
+    EVENT_SELECT, EVENT_FIND, EVENT_PLACE, EVENT_PILES_DONE,
+    EVENT_MERGE_START, EVENT_POP, EVENT_DONE,
+)
+from patience_io import check_values, parse_items, parse_text, read_values
+from patience_replay import EXTENSION as REPLAY_EXTENSION, open_replay, write_replay
+
+# tkinter is imported by load_tk() when the visualizer is created, so the
+# module (and the headless CLI it dispatches to) works without Tk or a display
+tk = ttk = messagebox = filedialog = None
+
+# Pile sets beyond these sizes are drawn as an overview image of the pile
+# heights (one column per bucket of piles) unless the cell view is chosen
+OVERVIEW_WIDTH = 1030
+OVERVIEW_HEIGHT = 240
+OVERVIEW_MIN_PILES = 1000
+OVERVIEW_MIN_DEPTH = 1000
+
+
+def load_tk():
+    """Import tkinter and its dialogs into the module globals on first use"""
+    global tk, ttk, messagebox, filedialog
+    if tk is None:
+        import tkinter
+        from tkinter import ttk as tk_ttk, messagebox as tk_messagebox, filedialog as tk_filedialog
+        tk, ttk, messagebox, filedialog = tkinter, tk_ttk, tk_messagebox, tk_filedialog
+
+
+def timed(name):
+    """Add the wall time of every call of a method to self.perf under name"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.perf.add_time(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
 class PatienceSortVisualizer:
     def __init__(self):
+        load_tk()
         self.root = tk.Tk()
         self.root.title("Patience Sort Algorithm - Step by Step Visualization")
         self.root.geometry("1200x800")
         self.root.configure(bg='#1e1e2e')
         
-        # Algorithm state
-        self.original_array = []
-        self.piles = []
-        self.sorted_array = []
-        self.current_index = 0
-        self.current_element = 0
-        self.target_pile = -1
+        # Algorithm state lives in the headless engine; the GUI follows its events.
+        # Recorded runs are cached by input, so setting an array again is instant
+        self.trace_cache = TraceCache()
+        self.engine = PatienceSortEngine(cache=self.trace_cache)
+        self.engine.subscribe(self.on_engine_event)
         
         # Animation state
         self.is_running = False
         self.is_paused = False
-        self.is_completed = False
-        self.show_sorted = False
         self.animation_speed = 1500  # milliseconds
-        
-        # Animation phases
-        self.PHASE_IDLE = "idle"
-        self.PHASE_HIGHLIGHT = "highlight"
-        self.PHASE_FIND_PILE = "find_pile"
-        self.PHASE_PLACE = "place"
-        self.PHASE_RECONSTRUCT = "reconstruct"
-        self.current_phase = self.PHASE_IDLE
+        self.worker = None  # TraceWorker recording the run of a new array
+        self.lds_worker = None  # LDSWorker searching the LDS once it is highlighted
+        self.turbo = False  # many steps per frame, redrawn once per frame
+        self.target_fps = 60
+        self.steps_per_frame = 1  # adapted from the measured frame time
+        self.batch_keys = None  # cells changed during the current turbo frame
+        self.batch_event = None
+        self.sync_pending = None  # idle callback resyncing the visible canvas cells
+        self.perf = PerfCounters()  # canvas item churn and draw times, next to engine.counters
+        self.overlay_items = None  # (background, text) of the performance overlay
+        self.overlay_job = None
+        self.highlighted = frozenset()  # input indices of the highlighted LIS/LDS
+        self.code_text = None  # code panel, built after the first paint
+        self.overview = False  # piles drawn as the overview image instead of cells
+        self.overview_image = None
+        self.overview_tallest = 1  # pile height the overview is scaled to
+        self.overview_piles = 1  # pile count the overview columns are bucketed for
+        self.overview_totals = []  # tallest pile of every overview column
+        self.overview_remaining = []  # tallest unmerged part of every overview column
+        self.overview_dirty = None  # overview columns to repaint, None for all of them
+        self.overview_target = -1  # overview column holding the target pile
         
         # Colors
         self.colors = {
@@ -48,7 +106,8 @@ class PatienceSortVisualizer:
             'text': '#ffffff',
             'text_dark': '#2d3748',
             'header_bg': '#2a2a3e',
-            'accent': '#7c3aed'
+            'accent': '#7c3aed',
+            'subsequence': '#ec4899'
         }
         
         self.setup_ui()
@@ -154,7 +213,7 @@ class PatienceSortVisualizer:
         # Array input label
         tk.Label(
             input_frame,
-            text="🔢 Enter Array (minimum 10 elements, comma-separated):",
+            text="🔢 Enter Array (minimum 10 elements, comma-separated numbers or words):",
             font=('Arial', 12, 'bold'),
             fg=self.colors['text'],
             bg=self.colors['bg']
@@ -199,6 +258,33 @@ class PatienceSortVisualizer:
             pady=6
         )
         set_array_btn.pack(side=tk.LEFT, padx=3)
+
+        # Open file button, for datasets too large for the entry field
+        open_file_btn = tk.Button(
+            input_container,
+            text="📂 Open File…",
+            command=self.open_file,
+            font=('Arial', 10, 'bold'),
+            bg=self.colors['accent'],
+            fg='white',
+            padx=12,
+            pady=6
+        )
+        open_file_btn.pack(side=tk.LEFT, padx=3)
+
+        # Save the recorded run as a replay file, opened again with Open File
+        self.save_replay_btn = tk.Button(
+            input_container,
+            text="💾 Save Replay…",
+            command=self.save_replay,
+            font=('Arial', 10, 'bold'),
+            bg=self.colors['accent'],
+            fg='white',
+            padx=12,
+            pady=6,
+            state=tk.DISABLED
+        )
+        self.save_replay_btn.pack(side=tk.LEFT, padx=3)
         
         # Status label
         self.status_label = tk.Label(
@@ -276,13 +362,127 @@ class PatienceSortVisualizer:
         speed_combo = ttk.Combobox(
             speed_frame,
             textvariable=self.speed_var,
-            values=["Slow", "Normal", "Fast"],
+            values=["Slow", "Normal", "Fast", "Turbo"],
             state="readonly",
             width=8,
             font=('Arial', 9)
         )
         speed_combo.pack(side=tk.LEFT, padx=5)
         speed_combo.bind('<<ComboboxSelected>>', self.change_speed)
+
+        # Live performance counters drawn over the canvas
+        self.overlay_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            speed_frame,
+            text="📊 Perf overlay",
+            variable=self.overlay_var,
+            command=self.toggle_overlay,
+            bg=self.colors['bg'],
+            fg=self.colors['text'],
+            selectcolor=self.colors['card_bg'],
+            activebackground=self.colors['bg'],
+            activeforeground=self.colors['text'],
+            font=('Arial', 9)
+        ).pack(side=tk.LEFT, padx=(10, 0))
+
+        # Longest increasing/decreasing subsequence highlighted on the input row
+        tk.Label(speed_frame, text="🔍 Highlight:", bg=self.colors['bg'], fg=self.colors['text'], font=('Arial', 10)).pack(side=tk.LEFT, padx=(10, 0))
+        self.highlight_var = tk.StringVar(value="None")
+        highlight_combo = ttk.Combobox(
+            speed_frame,
+            textvariable=self.highlight_var,
+            values=["None", "LIS", "LDS"],
+            state="readonly",
+            width=6,
+            font=('Arial', 9)
+        )
+        highlight_combo.pack(side=tk.LEFT, padx=5)
+        highlight_combo.bind('<<ComboboxSelected>>', self.change_highlight)
+
+        # Partial sort: the merge stops after the k smallest elements
+        tk.Label(speed_frame, text="🎯 Reconstruct:", bg=self.colors['bg'], fg=self.colors['text'], font=('Arial', 10)).pack(side=tk.LEFT, padx=(10, 0))
+        self.limit_var = tk.StringVar(value="All")
+        limit_combo = ttk.Combobox(
+            speed_frame,
+            textvariable=self.limit_var,
+            values=["All", "Smallest 10", "Smallest 100", "Smallest 1000"],
+            state="readonly",
+            width=12,
+            font=('Arial', 9)
+        )
+        limit_combo.pack(side=tk.LEFT, padx=5)
+        limit_combo.bind('<<ComboboxSelected>>', self.change_merge_limit)
+
+        # Level of detail of the piles: cells, or the overview for huge pile sets
+        tk.Label(speed_frame, text="🗺️ Piles:", bg=self.colors['bg'], fg=self.colors['text'], font=('Arial', 10)).pack(side=tk.LEFT, padx=(10, 0))
+        self.pile_view_var = tk.StringVar(value="Auto")
+        pile_view_combo = ttk.Combobox(
+            speed_frame,
+            textvariable=self.pile_view_var,
+            values=["Auto", "Cells", "Overview"],
+            state="readonly",
+            width=9,
+            font=('Arial', 9)
+        )
+        pile_view_combo.pack(side=tk.LEFT, padx=5)
+        pile_view_combo.bind('<<ComboboxSelected>>', lambda event: self.draw_visualization())
+        
+        # Timeline: the run is precomputed, so any step can be revisited
+        timeline_frame = tk.Frame(scrollable_frame, bg=self.colors['bg'])
+        timeline_frame.pack(fill=tk.X, pady=(0, 15), padx=5)
+        
+        self.back_btn = tk.Button(
+            timeline_frame,
+            text="⏮️ Step Back",
+            command=self.step_back,
+            font=('Arial', 10),
+            bg=self.colors['pile'],
+            fg='white',
+            padx=12,
+            pady=4,
+            state=tk.DISABLED
+        )
+        self.back_btn.pack(side=tk.LEFT, padx=4)
+        
+        self.timeline = tk.Scale(
+            timeline_frame,
+            from_=0,
+            to=0,
+            orient=tk.HORIZONTAL,
+            command=self.on_timeline,
+            bg=self.colors['bg'],
+            fg=self.colors['text'],
+            troughcolor=self.colors['card_bg'],
+            highlightthickness=0,
+            state=tk.DISABLED
+        )
+        self.timeline.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=8)
+        
+        self.merge_btn = tk.Button(
+            timeline_frame,
+            text="🔀 Jump to Merge",
+            command=lambda: self.seek_to(self.engine.phase_start(PHASE_RECONSTRUCT)),
+            font=('Arial', 10),
+            bg=self.colors['accent'],
+            fg='white',
+            padx=12,
+            pady=4,
+            state=tk.DISABLED
+        )
+        self.merge_btn.pack(side=tk.LEFT, padx=4)
+        
+        self.end_btn = tk.Button(
+            timeline_frame,
+            text="⏩ Jump to End",
+            command=lambda: self.seek_to(self.engine.total_steps),
+            font=('Arial', 10),
+            bg=self.colors['accent'],
+            fg='white',
+            padx=12,
+            pady=4,
+            state=tk.DISABLED
+        )
+        self.end_btn.pack(side=tk.LEFT, padx=4)
         
         # Visualization canvas - Make it scrollable vertically
         canvas_frame = tk.Frame(scrollable_frame, bg=self.colors['bg'])
@@ -295,18 +495,28 @@ class PatienceSortVisualizer:
             highlightcolor=self.colors['accent'],
             height=700  # <-- Increase this value as needed
         )
+        canvas_xscrollbar = ttk.Scrollbar(canvas_frame, orient="horizontal", command=self.canvas.xview)
+        canvas_xscrollbar.pack(side=tk.BOTTOM, fill=tk.X)
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         canvas_scrollbar = ttk.Scrollbar(canvas_frame, orient="vertical", command=self.canvas.yview)
         canvas_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.canvas.configure(yscrollcommand=canvas_scrollbar.set)
+        # Only cells inside the viewport exist as canvas items, so resync them on every scroll
+        self.canvas.configure(
+            yscrollcommand=lambda first, last: self.on_canvas_scroll(canvas_scrollbar, first, last),
+            xscrollcommand=lambda first, last: self.on_canvas_scroll(canvas_xscrollbar, first, last)
+        )
         
-        # Update scrollregion after drawing
-        def update_canvas_scrollregion(event=None):
-            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        # Update scrollregion after resizing
+        self.canvas.bind("<Configure>", self.update_scrollregion)
 
-        self.canvas.bind("<Configure>", update_canvas_scrollregion)
-        
+        # Initialize with empty state; the panels below the canvas start
+        # out of view, so they are built once the window is on screen
+        self.draw_visualization()
+        self.root.after_idle(self.setup_code_panel, scrollable_frame)
+
+    def setup_code_panel(self, scrollable_frame):
+        """Build the algorithm description and code display below the canvas"""
         # Algorithm description
         desc_frame = tk.Frame(scrollable_frame, bg=self.colors['bg'])
         desc_frame.pack(fill=tk.X, pady=10, padx=5)
@@ -330,20 +540,26 @@ class PatienceSortVisualizer:
         code_frame.pack(fill=tk.X, pady=(0, 10), padx=5)
 
         self.code_lines = [
-            "import bisect",
+            "import bisect, heapq",
             "",
             "def patience_sort(arr):",
-            "    piles = []",
+            "    piles, tops = [], []",
             "",
             "    for x in arr:",
-            "        idx = bisect.bisect_left([pile[-1] for pile in piles], x)",
+            "        idx = bisect.bisect_left(tops, x)",
             "        if idx == len(piles):",
-            "            piles.append([x])",
+            "            piles.append([x]); tops.append(x)",
             "        else:",
-            "            piles[idx].append(x)",
+            "            piles[idx].append(x); tops[idx] = x",
             "",
-            "    result = [item for pile in piles for item in pile]",
-            "    return sorted(result)"
+            "    heap = [(p[-1], i, len(p) - 1) for i, p in enumerate(piles)]",
+            "    heapq.heapify(heap)",
+            "    result = []",
+            "    while heap:",
+            "        x, i, j = heapq.heappop(heap)",
+            "        result.append(x)",
+            "        if j: heapq.heappush(heap, (piles[i][j - 1], i, j - 1))",
+            "    return result"
         ]
         self.code_text = tk.Text(
             code_frame,
@@ -358,9 +574,6 @@ class PatienceSortVisualizer:
         self.code_text.pack(fill=tk.X)
         self.code_text.insert(tk.END, "\n".join(self.code_lines))
         self.code_text.config(state=tk.DISABLED)
-        
-        # Initialize with empty state
-        self.draw_visualization()
     
     def generate_random_array(self):
         """Generate a random array"""
@@ -377,67 +590,182 @@ class PatienceSortVisualizer:
                 messagebox.showerror("Error", "Please enter an array!")
                 return
             
-            # Parse the array
-            array_elements = [int(x.strip()) for x in array_text.split(',')]
-            
-            # Validate minimum length
-            if len(array_elements) < 10:
-                messagebox.showerror("Error", f"Array must have at least 10 elements! You entered {len(array_elements)} elements.")
-                return
-            
-            # Validate elements are positive integers
-            if any(x <= 0 for x in array_elements):
-                messagebox.showerror("Error", "All elements must be positive integers!")
-                return
+            # Parse and validate the array in bulk; anything that is not all
+            # integers is sorted as numbers or words instead
+            try:
+                array_elements = parse_text(array_text)
+            except ValueError:
+                array_elements = parse_items(array_text)
+            check_values(array_elements)
             
-            # Set the array
-            self.original_array = array_elements
+            # Set the array and record its run in the background
+            self.engine.load(array_elements)
+            self.perf.reset()
             self.reset_algorithm()
+            self.start_recording()
             
-            # Enable start button
-            self.start_btn.config(state=tk.NORMAL)
-            
-            # Update status
-            self.update_status(f"✅ Array set successfully! {len(array_elements)} elements ready for sorting.")
-            
-            # Draw visualization
-            self.draw_visualization()
-            
-        except ValueError:
-            messagebox.showerror("Error", "Invalid input! Please enter comma-separated integers only.")
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
     
+    def open_file(self):
+        """Load a CSV/text, .npy or raw int64 file in the background"""
+        path = filedialog.askopenfilename(
+            title="Open array file",
+            filetypes=[
+                ("All supported", f"*.csv *.txt *.npy *.bin *.raw *.i64 *.int64 *{REPLAY_EXTENSION}"),
+                ("Text (comma or whitespace separated)", "*.csv *.txt"),
+                ("NumPy array", "*.npy"),
+                ("Raw little-endian int64", "*.bin *.raw *.i64 *.int64"),
+                ("Patience sort replay", f"*{REPLAY_EXTENSION}"),
+                ("All files", "*.*"),
+            ]
+        )
+        if not path:
+            return
+        if os.path.splitext(path)[1].lower() == REPLAY_EXTENSION:
+            self.open_replay_file(path)
+            return
+
+        # Large files never go through the entry field
+        self.array_entry.delete(0, tk.END)
+        self.engine.load([])
+        self.perf.reset()
+        self.reset_algorithm()
+        self.worker = TraceWorker(None, loader=lambda progress: read_values(path, progress),
+                                  cache=self.trace_cache)
+        self.worker.start()
+        self.update_controls()
+        self.update_status(f"⏳ Loading {os.path.basename(path)}...")
+        self.root.after(50, self.poll_worker, self.worker)
+
+    def open_replay_file(self, path):
+        """Play back a replay file, memory mapped instead of recorded again"""
+        try:
+            values, trace = open_replay(path)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        self.array_entry.delete(0, tk.END)
+        self.engine.load(values)
+        self.engine.set_trace(trace)
+        self.perf.reset()
+        self.reset_algorithm()
+        self.update_highlight()
+        self.update_status(f"📼 Replay {os.path.basename(path)} opened: {len(values):,} elements on "
+                           f"{trace.pile_count:,} piles, {format_bytes(os.path.getsize(path))} mapped from disk. "
+                           f"Click 'Start' or scrub the timeline.")
+
+    def save_replay(self):
+        """Write the recorded run to a replay file"""
+        if not self.engine.has_trace:
+            return
+        path = filedialog.asksaveasfilename(
+            title="Save replay",
+            defaultextension=REPLAY_EXTENSION,
+            filetypes=[("Patience sort replay", f"*{REPLAY_EXTENSION}")]
+        )
+        if not path:
+            return
+        try:
+            write_replay(path, self.engine.original_array, self.engine.trace)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.update_status(f"💾 Replay saved to {os.path.basename(path)} "
+                           f"({format_bytes(os.path.getsize(path))}).")
+
     def reset_algorithm(self):
         """Reset the algorithm to initial state"""
-        self.piles = []
-        self.sorted_array = []
-        self.current_index = 0
-        self.current_element = self.original_array[0] if self.original_array else 0
-        self.target_pile = -1
+        self.cancel_recording()
+        self.engine.reset()
+        if not self.engine.has_trace:
+            self.highlighted = frozenset()  # belonged to the previous array
+            self.cancel_lds()
         self.is_running = False
         self.is_paused = False
-        self.is_completed = False
-        self.show_sorted = False
-        self.current_phase = self.PHASE_IDLE
         
         # Reset button states
-        if self.original_array:
-            self.start_btn.config(state=tk.NORMAL, text="▶️ Start")
-        else:
-            self.start_btn.config(state=tk.DISABLED, text="▶️ Start")
-        self.step_btn.config(state=tk.DISABLED)
-        self.pause_btn.config(state=tk.DISABLED, text="⏸️ Pause")
+        self.update_controls()
         
-        if self.original_array:
-            self.update_status(f"🔄 Algorithm reset! Array with {len(self.original_array)} elements ready. Click 'Start' to begin.")
+        if self.engine.original_array and self.engine.has_trace:
+            self.update_status(f"🔄 Algorithm reset! Array with {len(self.engine.original_array)} elements ready. Click 'Start' to begin.")
+        elif self.engine.original_array:
+            self.update_status("⏹️ Recording cancelled. Click 'Set Array' to record the run again.")
         else:
             self.update_status("🚀 Ready to start! Enter an array (min 10 elements) and click 'Set Array' to begin.")
         self.draw_visualization()
     
+    def start_recording(self):
+        """Record the run in a worker thread so large inputs never block the window"""
+        self.worker = TraceWorker(self.engine.original_array, cache=self.trace_cache)
+        self.worker.start()
+        self.update_controls()
+        self.update_status(f"⏳ Recording the run of {len(self.engine.original_array):,} elements...")
+        self.root.after(50, self.poll_worker, self.worker)
+
+    def poll_worker(self, worker):
+        """Drain the worker's progress queue on the Tk thread"""
+        if worker is not self.worker:
+            return  # cancelled or replaced by a newer recording
+
+        try:
+            while True:
+                event = worker.events.get_nowait()
+                if event.stage == STAGE_LOAD:
+                    self.update_status(f"⏳ Loading file: {event.done / max(event.total, 1):.0%} read...")
+                elif event.stage == STAGE_LOADED:
+                    self.engine.load(event.values)
+                    self.perf.reset()
+                    self.update_controls()
+                    self.draw_visualization()
+                    self.update_status(f"⏳ Recording the run of {event.total:,} elements...")
+                elif event.stage == STAGE_PLACE:
+                    self.update_status(f"⏳ Recording: placed {event.done:,}/{event.total:,} elements "
+                                       f"on {event.pile_count:,} piles...")
+                elif event.stage == STAGE_MERGE:
+                    self.update_status(f"⏳ Recording: merged {event.done:,}/{event.total:,} elements "
+                                       f"from {event.pile_count:,} piles...")
+                else:
+                    self.finish_recording(event)
+                    return
+        except queue.Empty:
+            pass
+
+        self.root.after(50, self.poll_worker, worker)
+
+    def finish_recording(self, event: WorkerEvent):
+        """Install the recorded trace, or report why recording stopped"""
+        self.worker = None
+        self.is_paused = False
+        if event.stage == STAGE_DONE:
+            self.engine.set_trace(event.trace)
+            self.update_highlight()
+            memory = format_bytes(self.engine.memory_usage()['total'])
+            runs = event.trace.run_count
+            source = f"replayed from cache ({memory})" if event.cached else f"recorded in {memory}"
+            self.update_status(f"✅ Array set successfully! {len(self.engine.original_array)} elements ready for sorting "
+                               f"(run {source}, {runs:,} presorted run{'s' if runs != 1 else ''} detected).")
+        elif event.stage == STAGE_ERROR:
+            if isinstance(event.error, (ValueError, OSError)):
+                messagebox.showerror("Error", str(event.error))  # bad or unreadable input file
+            else:
+                messagebox.showerror("Error", f"An error occurred: {str(event.error)}")
+            self.update_status("🚀 Ready to start! Enter an array (min 10 elements) and click 'Set Array' to begin.")
+        self.update_controls()
+        self.draw_visualization()
+
+    def cancel_recording(self):
+        """Stop a recording that is still running"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+
     def start_algorithm(self):
         """Start or resume the algorithm"""
-        if not self.original_array:
+        if not self.engine.original_array:
             messagebox.showerror("Error", "Please set an array first!")
             return
             
@@ -446,7 +774,6 @@ class PatienceSortVisualizer:
             self.start_btn.config(state=tk.DISABLED)
             self.step_btn.config(state=tk.NORMAL)
             self.pause_btn.config(state=tk.NORMAL)
-            self.current_phase = self.PHASE_HIGHLIGHT
             self.auto_step()
         elif self.is_paused:
             self.toggle_pause()
@@ -458,131 +785,294 @@ class PatienceSortVisualizer:
             self.pause_btn.config(text="▶️ Resume")
         else:
             self.pause_btn.config(text="⏸️ Pause")
+
+        # While recording, Pause holds the worker thread instead of the animation
+        if self.worker is not None:
+            if self.is_paused:
+                self.worker.pause()
+                self.update_status("⏸️ Recording paused.")
+            else:
+                self.worker.resume()
+            return
+
+        if not self.is_paused:
             self.auto_step()
     
     def change_speed(self, event=None):
         """Change animation speed"""
-        speed_map = {"Slow": 2500, "Normal": 1500, "Fast": 800}
+        speed_map = {"Slow": 2500, "Normal": 1500, "Fast": 800, "Turbo": 0}
         self.animation_speed = speed_map[self.speed_var.get()]
+        self.turbo = self.speed_var.get() == "Turbo"
     
+    def change_highlight(self, event=None):
+        """Highlight the selected subsequence on the input row"""
+        mode = self.highlight_var.get()
+        if mode != "LDS":
+            self.cancel_lds()
+        length = self.update_highlight()
+        if mode == "LIS" and self.engine.has_trace:
+            self.update_status(f"📈 Longest increasing subsequence: {length:,} elements "
+                               f"(one per pile, {self.engine.trace.pile_count:,} piles).")
+        elif mode == "LDS" and self.engine.has_trace and self.lds_worker is None:
+            self.update_status(f"📉 Longest decreasing subsequence: {length:,} elements.")
+        self.draw_visualization()
+
+    def update_highlight(self) -> int:
+        """Recompute the highlighted input indices, return how many there are"""
+        mode = self.highlight_var.get()
+        if not self.engine.has_trace or mode == "None":
+            self.highlighted = frozenset()
+        elif mode == "LIS":
+            self.highlighted = frozenset(self.engine.longest_increasing_subsequence())
+        elif self.engine.has_lds:
+            self.highlighted = frozenset(self.engine.longest_decreasing_subsequence())
+        else:
+            # The piles do not give the LDS, it takes a pass of its own
+            self.highlighted = frozenset()
+            self.start_lds()
+        return len(self.highlighted)
+
+    def start_lds(self):
+        """Search the longest decreasing subsequence in a worker thread"""
+        if self.lds_worker is not None:
+            return
+        self.lds_worker = LDSWorker(self.engine.original_array)
+        self.lds_worker.start()
+        self.update_status("⏳ Finding the longest decreasing subsequence...")
+        self.root.after(50, self.poll_lds, self.lds_worker)
+
+    def poll_lds(self, worker):
+        """Drain the LDS worker's progress queue on the Tk thread"""
+        if worker is not self.lds_worker:
+            return  # cancelled
+        if worker.values is not self.engine.original_array:
+            self.cancel_lds()  # another array was set meanwhile
+            return
+
+        try:
+            while True:
+                event = worker.events.get_nowait()
+                if event.stage == STAGE_LDS:
+                    self.update_status(f"⏳ Finding the longest decreasing subsequence: "
+                                       f"{event.done / max(event.total, 1):.0%} scanned...")
+                    continue
+                self.lds_worker = None
+                if event.stage == STAGE_DONE:
+                    self.engine.set_lds(event.lds)
+                    if self.highlight_var.get() == "LDS":
+                        length = self.update_highlight()
+                        self.update_status(f"📉 Longest decreasing subsequence: {length:,} elements.")
+                        self.draw_visualization()
+                elif event.stage == STAGE_ERROR:
+                    messagebox.showerror("Error", f"An error occurred: {str(event.error)}")
+                return
+        except queue.Empty:
+            pass
+
+        self.root.after(50, self.poll_lds, worker)
+
+    def cancel_lds(self):
+        """Stop an LDS search that is still running"""
+        if self.lds_worker is not None:
+            self.lds_worker.cancel()
+            self.lds_worker = None
+
+    def change_merge_limit(self, event=None):
+        """Reconstruct only the k smallest elements, or all of them"""
+        choice = self.limit_var.get()
+        self.engine.set_merge_limit(None if choice == "All" else int(choice.split()[-1]))
+        if self.engine.is_finished:
+            self.is_running = False
+        if self.engine.has_trace:
+            self.draw_visualization()
+            self.update_controls()
+        if self.engine.is_finished:
+            self.update_status(self.completion_message())
+        elif self.engine.merge_limit is not None:
+            self.update_status(f"🎯 The merge will stop after the {self.engine.merge_count:,} smallest elements.")
+
+    def completion_message(self) -> str:
+        """Status line for a finished run, full or partial"""
+        engine = self.engine
+        if engine.merge_count < len(engine.original_array):
+            return (f"🎉 Algorithm Complete! The {engine.merge_count:,} smallest elements were "
+                    f"taken from the piles, the rest stay unmerged.")
+        return "🎉 Algorithm Complete! Sorted array has been reconstructed from the piles."
+
     def next_step(self):
         """Execute next step of the algorithm"""
-        if not self.original_array:
+        if not self.engine.has_trace:
             return
 
-        # Highlight the for loop line
-        self.highlight_code_line(5)  # "for x in arr:"
+        self.engine.step()
+        self.timeline.set(self.engine.position)
 
-        if self.is_completed and not self.show_sorted:
-            self.reconstruct_sorted_array()
+    def seek_to(self, position):
+        """Jump to any step of the run and redraw"""
+        if not self.engine.has_trace:
             return
 
-        if self.is_completed:
-            return
+        self.engine.seek(position)
+        self.draw_visualization()
+        self.update_controls()
+        if self.engine.is_finished:
+            self.update_status(self.completion_message())
+        else:
+            self.update_status(f"⏩ Jumped to step {self.engine.position}/{self.engine.total_steps}.")
 
-        if self.current_index >= len(self.original_array):
-            self.is_completed = True
-            self.current_phase = self.PHASE_IDLE
-            self.update_status("📋 Phase 1 Complete! All elements placed in piles. Click 'Next Step' to reconstruct sorted array.")
-            self.draw_visualization()
+    def step_back(self):
+        """Undo the last step"""
+        self.seek_to(self.engine.position - 1)
+
+    def on_timeline(self, value):
+        """Seek when the timeline slider is moved"""
+        position = int(float(value))
+        if position != self.engine.position:
+            self.seek_to(position)
+
+    def update_controls(self):
+        """Sync button states and the timeline with the engine position"""
+        engine = self.engine
+        has_array = bool(engine.original_array)
+
+        has_trace = has_array and engine.has_trace
+
+        if engine.is_finished:
+            self.start_btn.config(state=tk.DISABLED, text="✅ Completed")
+        elif self.is_running or not has_trace:
+            self.start_btn.config(state=tk.DISABLED, text="▶️ Start")
+        else:
+            self.start_btn.config(state=tk.NORMAL, text="▶️ Start")
+
+        can_step = has_trace and not engine.is_finished and (self.is_running or engine.position > 0)
+        self.step_btn.config(state=tk.NORMAL if can_step else tk.DISABLED)
+        if self.worker is not None:
+            self.pause_btn.config(state=tk.NORMAL)
+        elif not self.is_running:
+            self.pause_btn.config(state=tk.DISABLED, text="⏸️ Pause")
+
+        timeline_state = tk.NORMAL if has_trace else tk.DISABLED
+        for button in (self.back_btn, self.merge_btn, self.end_btn, self.save_replay_btn):
+            button.config(state=timeline_state)
+        self.timeline.config(to=engine.total_steps if has_trace else 0, state=timeline_state)
+        self.timeline.set(engine.position)
+
+    def on_engine_event(self, event: StepEvent):
+        """Follow an engine event on the canvas, status line and code panel"""
+        self.update_canvas(event)
+        if self.batch_keys is not None:
+            self.batch_event = event  # described once at the end of the frame
             return
+        self.describe_event(event)
+
+    def describe_event(self, event: StepEvent):
+        """Update status, code highlight and buttons for an engine event"""
+        total = len(self.engine.original_array)
 
-        if self.current_phase == self.PHASE_HIGHLIGHT:
-            self.current_element = self.original_array[self.current_index]
-            self.current_phase = self.PHASE_FIND_PILE
-            self.update_status(f"🔍 Step {self.current_index + 1}/{len(self.original_array)}: Processing element {self.current_element}")
-            self.highlight_code_line(6)  # "idx = bisect.bisect_left..."
+        if event.kind == EVENT_SELECT:
+            self.update_status(f"🔍 Step {event.index + 1}/{total}: Processing element {event.value}")
+            self.highlight_code_line(6)  # "idx = bisect.bisect_left(tops, x)"
 
-        elif self.current_phase == self.PHASE_FIND_PILE:
-            self.find_target_pile()
-            self.current_phase = self.PHASE_PLACE
+        elif event.kind == EVENT_FIND:
             self.highlight_code_line(7)  # "if idx == len(piles):"
-            if self.target_pile == -1:
-                self.update_status(f"🆕 No suitable pile found for {self.current_element}. Creating new pile.")
+            if event.new_pile:
+                self.update_status(f"🆕 No suitable pile found for {event.value}. Creating new pile.")
             else:
-                self.update_status(f"🎯 Found suitable pile {self.target_pile + 1} for element {self.current_element}.")
+                self.update_status(f"🎯 Found suitable pile {event.pile + 1} for element {event.value}.")
 
-        elif self.current_phase == self.PHASE_PLACE:
-            self.place_element()
-            self.current_index += 1
-            if self.current_index < len(self.original_array):
-                self.current_phase = self.PHASE_HIGHLIGHT
+        elif event.kind == EVENT_PLACE:
+            if event.new_pile:
+                self.highlight_code_line(8)  # "piles.append([x]); tops.append(x)"
             else:
-                self.is_completed = True
-                self.current_phase = self.PHASE_IDLE
-                self.update_status("📋 Phase 1 Complete! All elements placed in piles. Click 'Next Step' to reconstruct sorted array.")
+                self.highlight_code_line(10)  # "piles[idx].append(x); tops[idx] = x"
 
-        self.draw_visualization()
+        elif event.kind == EVENT_PILES_DONE:
+            self.highlight_code_line(5)  # "for x in arr:"
+            self.update_status("📋 Phase 1 Complete! All elements placed in piles. Click 'Next Step' to reconstruct sorted array.")
 
-    def find_target_pile(self):
-        """Find the target pile for current element"""
-        self.target_pile = -1
-        for i, pile in enumerate(self.piles):
-            if pile[-1] >= self.current_element:
-                self.target_pile = i
-                break
-    
-    def place_element(self):
-        """Place current element in appropriate pile"""
-        if self.target_pile == -1:
-            self.piles.append([self.current_element])
-            self.highlight_code_line(8)  # "piles.append([x])"
-        else:
-            self.piles[self.target_pile].append(self.current_element)
-            self.highlight_code_line(10)  # "piles[idx].append(x)"
-        self.target_pile = -1
-    
-    def reconstruct_sorted_array(self):
-        """Reconstruct sorted array from piles"""
-        self.current_phase = self.PHASE_RECONSTRUCT
-        self.update_status("🔄 Reconstructing sorted sequence by taking smallest top elements...")
-        self.highlight_code_line(12)  # "result = [item for pile in piles for item in pile]"
-
-        temp_piles = [pile.copy() for pile in self.piles]
-        self.sorted_array = []
-
-        while any(pile for pile in temp_piles):
-            min_val = float('inf')
-            min_pile = -1
-
-            for i, pile in enumerate(temp_piles):
-                if pile and pile[-1] < min_val:
-                    min_val = pile[-1]
-                    min_pile = i
-
-            if min_pile != -1:
-                self.sorted_array.append(temp_piles[min_pile].pop())
-
-        self.show_sorted = True
-        self.current_phase = self.PHASE_IDLE
-        self.update_status("🎉 Algorithm Complete! Sorted array has been reconstructed from the piles.")
-        self.start_btn.config(text="✅ Completed", state=tk.DISABLED)
-        self.step_btn.config(state=tk.DISABLED)
-        self.pause_btn.config(state=tk.DISABLED)
-        self.highlight_code_line(13)  # "return sorted(result)"
-        self.draw_visualization()
+        elif event.kind == EVENT_MERGE_START:
+            self.highlight_code_line(12)  # "heap = [(p[-1], i, len(p) - 1) ...]"
+            self.update_status("🔄 Reconstructing sorted sequence by taking smallest top elements...")
+
+        elif event.kind == EVENT_POP:
+            self.highlight_code_line(16)  # "x, i, j = heapq.heappop(heap)"
+            self.update_status(f"📤 Took smallest top element {event.value} from pile {event.pile + 1} "
+                               f"({event.index + 1}/{self.engine.merge_count} sorted).")
+
+        elif event.kind == EVENT_DONE:
+            self.is_running = False
+            message = self.completion_message()
+            if self.overlay_var.get():
+                message += " " + self.perf_summary()
+            self.update_status(message)
+            self.update_controls()
+            self.highlight_code_line(19)  # "return result"
     
     def auto_step(self):
         """Automatically execute next step with delay"""
-        if not self.is_running or self.is_paused or self.is_completed:
+        if not self.is_running or self.is_paused:
+            return
+        
+        if self.turbo:
+            self.turbo_frame()
             return
         
         self.next_step()
         
-        if self.is_running and not self.is_paused and not self.is_completed:
+        if self.is_running and not self.is_paused:
             self.root.after(self.animation_speed, self.auto_step)
-        elif self.is_completed and not self.show_sorted:
-            self.root.after(self.animation_speed, self.reconstruct_sorted_array)
+
+    def turbo_frame(self):
+        """Advance as many steps as fit in one frame, then redraw once"""
+        frame_budget = 1.0 / self.target_fps
+        started = time.perf_counter()
+
+        self.batch_keys = set()
+        self.batch_event = None
+        try:
+            for _ in range(self.steps_per_frame):
+                if self.engine.is_finished:
+                    break
+                self.engine.step()
+        finally:
+            keys, self.batch_keys = self.batch_keys, None
+
+        if self.layout_ready:
+            self.refresh_canvas(keys)
+        if self.batch_event is not None:
+            self.describe_event(self.batch_event)
+        self.timeline.set(self.engine.position)
+
+        # Adapt the batch size so our work takes about 70% of the frame,
+        # leaving the rest for Tk to repaint and handle input
+        elapsed = time.perf_counter() - started
+        scale = min(2.0, max(0.5, 0.7 * frame_budget / max(elapsed, 1e-6)))
+        self.steps_per_frame = max(1, int(self.steps_per_frame * scale))
+
+        if self.is_running and not self.is_paused:
+            delay = max(1, int((frame_budget - elapsed) * 1000))
+            self.root.after(delay, self.auto_step)
     
     def update_status(self, message: str):
         """Update status message"""
         self.status_label.config(text=message)
     
+    @timed('draw_visualization')
     def draw_visualization(self):
-        """Draw the complete visualization"""
+        """Rebuild the canvas for the engine state, materializing only visible cells"""
+        self.perf.add('full_redraws')
+        self.perf.add('items_deleted', len(self.canvas.find_all()))
         self.canvas.delete("all")
+        self.overlay_items = None
+        self.cells = {}       # ('input', i) / ('pile', pile, depth) / ('sorted', i) -> (rect id, text id)
+        self.free_cells = []  # hidden (rect id, text id) pairs ready to be recycled
+        self.pile_labels = {}  # pile index -> text id, for visible piles only
+        self.piles_title = None
+        self.sorted_title = None
+        self.target_outline = None
+        self.layout_ready = False
 
-        if not self.original_array:
+        if not self.engine.original_array:
             self.canvas.create_text(
                 575, 250,
                 text="Enter an array to begin visualization\n(Minimum 10 elements required)",
@@ -590,200 +1080,631 @@ class PatienceSortVisualizer:
                 fill=self.colors['text'],
                 justify=tk.CENTER
             )
+            self.perf.add('items_created')
+            self.update_scrollregion()
+            self.draw_overlay()
             return
 
+        self.compute_layout()
+
         # Draw original array
         self.draw_original_array()
 
-        # Draw piles and get the bottom Y position
-        piles_bottom_y = 180
-        if self.piles:
-            piles_bottom_y = self.draw_piles()
+        # Draw piles
+        self.draw_piles()
 
         # Draw sorted array below the piles
-        if self.show_sorted:
-            self.draw_sorted_array(start_y=piles_bottom_y)
+        if self.engine.merge_started:
+            self.draw_sorted_array()
 
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-    
-    def draw_original_array(self):
-        """Draw the original input array"""
-        if not self.original_array:
+        self.layout_ready = True
+        self.update_scrollregion()
+        self.sync_viewport()
+        self.draw_overlay()
+
+    def update_canvas(self, event: StepEvent):
+        """Apply the canvas changes of a single engine event without a full redraw"""
+        if not self.layout_ready:
             return
-            
-        start_x = 30
-        start_y = 40
-        box_width = min(50, (1090 - 60) // len(self.original_array))  # Adjust width based on array size
-        box_height = 35
-        spacing = 3
-        
-        # Calculate actual width needed
-        total_width = len(self.original_array) * (box_width + spacing) - spacing
-        if total_width > 1090:
-            # If too wide, make multiple rows
-            elements_per_row = 1090 // (box_width + spacing)
-            rows = (len(self.original_array) + elements_per_row - 1) // elements_per_row
+
+        if event.kind == EVENT_PLACE:
+            self.max_pile_len = max(self.max_pile_len, self.engine.pile_sizes[event.pile])
+        if self.overview:
+            self.update_overview(event)
+
+        if self.batch_keys is not None:
+            # Turbo mode: only collect the changed cells, they are drawn once per frame
+            self.batch_keys.update(self.changed_keys(event))
+            return
+
+        self.refresh_canvas(self.changed_keys(event))
+
+    def changed_keys(self, event: StepEvent):
+        """Yield the keys of the cells an engine event changed or created"""
+        engine = self.engine
+        if event.kind == EVENT_SELECT:
+            yield ('input', event.index)
+
+        elif event.kind == EVENT_PLACE:
+            size = engine.pile_sizes[event.pile]
+            yield ('input', event.index)
+            if event.index + 1 < len(engine.original_array):
+                yield ('input', event.index + 1)
+            if size > 1:
+                yield ('pile', event.pile, size - 2)  # old top
+            yield ('pile', event.pile, size - 1)
+
+        elif event.kind == EVENT_POP:
+            remaining = engine.pile_sizes[event.pile] - engine.merge_taken[event.pile]
+            yield ('pile', event.pile, remaining)
+            if remaining:
+                yield ('pile', event.pile, remaining - 1)
+            yield ('sorted', event.index)
+
+    @timed('refresh_canvas')
+    def refresh_canvas(self, keys):
+        """Redraw the given cells, the titles and the target outline from the engine state"""
+        engine = self.engine
+        if engine.merge_started and self.sorted_title is None:
+            self.draw_sorted_array()
+
+        view = self.viewport()
+        for key in keys:
+            cell = self.cells.get(key)
+            if cell is not None:
+                _, _, color, text_color, _ = self.cell_spec(key)
+                self.canvas.itemconfig(cell[0], fill=color)
+                self.canvas.itemconfig(cell[1], fill=text_color)
+            elif self.is_visible(key, view):
+                self.place_cell(key)
+
+        for pile_idx in self.visible_piles(view):
+            if pile_idx not in self.pile_labels:
+                self.create_pile_label(pile_idx)
+        if self.overview:
+            self.draw_overview()
+        self.canvas.itemconfig(self.piles_title, text=self.piles_title_text())
+        if self.sorted_title is not None:
+            self.canvas.itemconfig(self.sorted_title, text=f"Sorted Result ({engine.sorted_count} elements):")
+
+        if engine.current_phase == PHASE_PLACE and not self.overview:
+            self.move_target_outline(engine.target_pile)
         else:
-            elements_per_row = len(self.original_array)
-            rows = 1
-        
-        # Label
-        self.canvas.create_text(
-            start_x, start_y - 18,
-            text=f"Input Array ({len(self.original_array)} elements):",
-            font=('Arial', 12, 'bold'),
-            fill=self.colors['text'],
-            anchor=tk.W
-        )
-        
-        for i, value in enumerate(self.original_array):
-            row = i // elements_per_row
-            col = i % elements_per_row
-            x = start_x + col * (box_width + spacing)
-            y = start_y + row * (box_height + spacing + 3)
-            
-            # Determine color
-            if i == self.current_index and self.current_phase in [self.PHASE_HIGHLIGHT, self.PHASE_FIND_PILE]:
-                color = self.colors['current']
-                text_color = 'white'
-            elif i < self.current_index:
-                color = '#666666'  # Processed
-                text_color = 'white'
-            else:
-                color = self.colors['primary']
-                text_color = 'white'
-            
-            # Draw box
-            self.canvas.create_rectangle(
-                x, y, x + box_width, y + box_height,
+            self.canvas.itemconfig(self.target_outline, state=tk.HIDDEN)
+
+        self.update_scrollregion()
+
+    def compute_layout(self):
+        """Compute cell sizes and section positions for the current input"""
+        n = len(self.engine.original_array)
+        # Cells shrink for longer inputs but never below a readable width;
+        # very long inputs wrap into rows and are scrolled instead
+        box_width = max(36, min(50, (1090 - 60) // n))
+        self.grid_box_width = box_width
+        self.grid_per_row = min(n, 1090 // (box_width + 3))
+        self.grid_font_size = min(14, box_width // 3)
+        self.input_start_y = 40
+        self.piles_start_y = max(180, self.input_start_y + self.grid_height(n) + 50)
+        self.max_pile_len = max(self.engine.pile_sizes, default=0)
+
+        # The level of detail follows the final pile set, so it stays put during the run
+        pile_count = self.engine.trace.pile_count if self.engine.has_trace else 0
+        if pile_count:
+            self.overview_piles = pile_count
+            self.overview_tallest = max(self.engine.trace.pile_lengths)
+        else:
+            self.overview_piles = max(1, len(self.engine.pile_sizes))
+            self.overview_tallest = max(self.max_pile_len, 1)
+        mode = self.pile_view_var.get()
+        if mode == "Auto":
+            self.overview = pile_count > OVERVIEW_MIN_PILES or self.overview_tallest > OVERVIEW_MIN_DEPTH
+        else:
+            self.overview = mode == "Overview"
+
+    def grid_height(self, count):
+        """Height of an input-sized grid holding count cells"""
+        rows = (count + self.grid_per_row - 1) // self.grid_per_row
+        return rows * (35 + 3 + 3)
+
+    def grid_box(self, i, start_y):
+        """Return (x, y, width, height) of cell i of an input-sized grid"""
+        row = i // self.grid_per_row
+        col = i % self.grid_per_row
+        x = 30 + col * (self.grid_box_width + 3)
+        y = start_y + row * (35 + 3 + 3)
+        return x, y, self.grid_box_width, 35
+
+    def pile_box(self, pile_idx, depth):
+        """Return (x, y, width, height) of the cell at depth (0 = bottom) of a pile"""
+        x = 30 + pile_idx * (45 + 15)
+        y = self.piles_start_y + depth * (30 + 2)
+        return x, y, 45, 30
+
+    def sorted_start_y(self):
+        """Y position of the sorted row, just below the tallest pile"""
+        if self.overview:
+            return self.piles_start_y + OVERVIEW_HEIGHT + 30 + 18
+        return self.piles_start_y + self.max_pile_len * (30 + 2) + 30 + 18
+
+    def input_cell_colors(self, i):
+        """Return (fill, text color) of input cell i for the engine state"""
+        engine = self.engine
+        if i == engine.current_index and engine.current_phase in [PHASE_HIGHLIGHT, PHASE_FIND_PILE, PHASE_PLACE]:
+            return self.colors['current'], 'white'
+        elif i in self.highlighted:
+            return self.colors['subsequence'], 'white'
+        elif i < engine.current_index:
+            return '#666666', 'white'  # Processed
+        return self.colors['primary'], 'white'
+
+    def pile_cell_colors(self, pile_idx, depth):
+        """Return (fill, text color) of a pile cell for the engine state"""
+        engine = self.engine
+        # Elements above this depth were already taken by the reconstruction
+        remaining = engine.pile_sizes[pile_idx] - (engine.merge_taken[pile_idx] if engine.merge_taken else 0)
+        if depth >= remaining:
+            return '#666666', 'white'  # Taken
+        elif depth == remaining - 1:
+            return self.colors['pile_top'], self.colors['text_dark']
+        return self.colors['pile'], 'white'
+
+    def cell_spec(self, key):
+        """Return (box, value, fill, text color, font size) of a cell key"""
+        engine = self.engine
+        if key[0] == 'input':
+            i = key[1]
+            return (self.grid_box(i, self.input_start_y), engine.original_array[i],
+                    *self.input_cell_colors(i), self.grid_font_size)
+        if key[0] == 'pile':
+            _, pile_idx, depth = key
+            return (self.pile_box(pile_idx, depth), engine.pile_value(pile_idx, depth),
+                    *self.pile_cell_colors(pile_idx, depth), 11)
+        i = key[1]
+        return (self.grid_box(i, self.sorted_start_y()), engine.sorted_value(i),
+                self.colors['sorted'], self.colors['text_dark'], self.grid_font_size)
+
+    def viewport(self):
+        """Return the visible canvas area (x0, y0, x1, y1) grown by a scroll margin"""
+        margin = 200
+        x0 = self.canvas.canvasx(0)
+        y0 = self.canvas.canvasy(0)
+        return (x0 - margin, y0 - margin,
+                x0 + self.canvas.winfo_width() + margin, y0 + self.canvas.winfo_height() + margin)
+
+    def visible_keys(self):
+        """Yield the keys of every cell inside the viewport"""
+        engine = self.engine
+        x0, y0, x1, y1 = self.viewport()
+        row_height = 35 + 3 + 3
+
+        def grid_range(start_y, count):
+            first_row = max(0, int(y0 - start_y) // row_height)
+            last_row = int(y1 - start_y) // row_height
+            return range(first_row * self.grid_per_row, min(count, (last_row + 1) * self.grid_per_row))
+
+        for i in grid_range(self.input_start_y, len(engine.original_array)):
+            yield ('input', i)
+
+        first_depth = max(0, int(y0 - self.piles_start_y) // (30 + 2))
+        last_depth = int(y1 - self.piles_start_y) // (30 + 2)
+        for pile_idx in self.visible_piles((x0, y0, x1, y1)):
+            for depth in range(first_depth, min(engine.pile_sizes[pile_idx], last_depth + 1)):
+                yield ('pile', pile_idx, depth)
+
+        if engine.merge_started:
+            for i in grid_range(self.sorted_start_y(), engine.sorted_count):
+                yield ('sorted', i)
+
+    def visible_piles(self, view=None):
+        """Range of pile indices whose column is inside the viewport (none in the overview)"""
+        if self.overview:
+            return range(0)
+        x0, _, x1, _ = view or self.viewport()
+        first = max(0, int(x0 - 30) // (45 + 15))
+        last = int(x1 - 30) // (45 + 15)
+        return range(first, min(len(self.engine.pile_sizes), last + 1))
+
+    def is_visible(self, key, view=None):
+        """Whether the cell for key lies inside the viewport"""
+        if key[0] == 'pile' and self.overview:
+            return False
+        x, y, width, height = self.cell_spec(key)[0]
+        x0, y0, x1, y1 = view or self.viewport()
+        return x + width >= x0 and x <= x1 and y + height >= y0 and y <= y1
+
+    @timed('sync_viewport')
+    def sync_viewport(self):
+        """Materialize the cells inside the viewport and recycle the rest"""
+        self.sync_pending = None
+        if not self.layout_ready:
+            return
+        wanted = set(self.visible_keys())
+        for key in [key for key in self.cells if key not in wanted]:
+            self.hide_cell(key)
+        for key in wanted:
+            if key not in self.cells:
+                self.place_cell(key)
+
+        piles = self.visible_piles()
+        for pile_idx in [p for p in self.pile_labels if p not in piles]:
+            self.canvas.delete(self.pile_labels.pop(pile_idx))
+            self.perf.add('items_deleted')
+        for pile_idx in piles:
+            if pile_idx not in self.pile_labels:
+                self.create_pile_label(pile_idx)
+
+    def schedule_sync(self):
+        """Coalesce viewport syncs triggered by scrolling into one idle callback"""
+        if self.sync_pending is None:
+            self.sync_pending = self.root.after_idle(self.sync_viewport)
+
+    def on_canvas_scroll(self, scrollbar, first, last):
+        """Scroll callback: move the scrollbar and resync the visible cells"""
+        scrollbar.set(first, last)
+        self.schedule_sync()
+
+    def place_cell(self, key):
+        """Show the cell for key, reusing a recycled item pair when possible"""
+        (x, y, width, height), value, color, text_color, font_size = self.cell_spec(key)
+        if self.free_cells:
+            rect, text = self.free_cells.pop()
+            self.canvas.coords(rect, x, y, x + width, y + height)
+            self.canvas.coords(text, x + width // 2, y + height // 2)
+            self.canvas.itemconfig(rect, fill=color, state=tk.NORMAL)
+            self.canvas.itemconfig(text, text=self.cell_label(value, width), fill=text_color,
+                                   font=('Arial', font_size, 'bold'), state=tk.NORMAL)
+            self.perf.add('cells_recycled')
+        else:
+            rect = self.canvas.create_rectangle(
+                x, y, x + width, y + height,
                 fill=color,
                 outline='white',
                 width=2
             )
-            
-            # Draw value
-            self.canvas.create_text(
-                x + box_width // 2, y + box_height // 2,
-                text=str(value),
-                font=('Arial', min(14, box_width // 3), 'bold'),
+            text = self.canvas.create_text(
+                x + width // 2, y + height // 2,
+                text=self.cell_label(value, width),
+                font=('Arial', font_size, 'bold'),
                 fill=text_color
             )
-    
-    def draw_piles(self):
-        """Draw the piles and return the bottom Y position"""
-        if not self.piles:
-            return 180  # Default start_y if no piles
+            self.perf.add('items_created', 2)
+        self.cells[key] = (rect, text)
 
-        start_x = 30
-        start_y = 180
-        box_width = min(45, (1090 - 60) // len(self.piles))
-        box_height = 30
-        pile_spacing = box_width + 15
+    def cell_label(self, value, width):
+        """Text of a cell: integers in full, floats shortened, words cut to the cell width"""
+        if isinstance(value, int):
+            return str(value)
+        label = f"{value:.4g}" if isinstance(value, float) else str(value)
+        max_chars = max(2, width // 8)
+        return label if len(label) <= max_chars else label[:max_chars - 1] + "…"
 
-        max_pile_height = 0
+    def hide_cell(self, key):
+        """Hide the cell for key and keep its items for reuse"""
+        rect, text = self.cells.pop(key)
+        self.canvas.itemconfig(rect, state=tk.HIDDEN)
+        self.canvas.itemconfig(text, state=tk.HIDDEN)
+        self.free_cells.append((rect, text))
 
-        # Label
+    def draw_original_array(self):
+        """Draw the title of the input array; cells are materialized by sync_viewport"""
         self.canvas.create_text(
-            start_x, start_y - 18,
-            text=f"Piles ({len(self.piles)} piles):",
+            30, self.input_start_y - 18,
+            text=f"Input Array ({len(self.engine.original_array)} elements):",
             font=('Arial', 12, 'bold'),
             fill=self.colors['text'],
             anchor=tk.W
         )
+        self.perf.add('items_created')
 
-        for pile_idx, pile in enumerate(self.piles):
-            x = start_x + pile_idx * pile_spacing
-            pile_height = len(pile) * (box_height + 2)
-            if pile_height > max_pile_height:
-                max_pile_height = pile_height
+    def draw_piles(self):
+        """Draw the piles title and target outline; piles grow downwards from their bottom element"""
+        engine = self.engine
 
-            # Pile number
-            self.canvas.create_text(
-                x + box_width // 2, start_y - 5,
-                text=f"P{pile_idx + 1}",
-                font=('Arial', 10),
-                fill=self.colors['text']
-            )
+        # Label
+        self.piles_title = self.canvas.create_text(
+            30, self.piles_start_y - 18,
+            text=self.piles_title_text(),
+            font=('Arial', 12, 'bold'),
+            fill=self.colors['text'],
+            anchor=tk.W
+        )
 
-            # Highlight target pile
-            if pile_idx == self.target_pile and self.current_phase == self.PHASE_FIND_PILE:
-                highlight_height = len(pile) * (box_height + 2) + 8
-                self.canvas.create_rectangle(
-                    x - 3, start_y - 3,
-                    x + box_width + 3, start_y + highlight_height,
-                    fill='',
-                    outline=self.colors['highlight'],
-                    width=3
-                )
-
-            # Draw pile elements (bottom to top)
-            for elem_idx, value in enumerate(pile):
-                y = start_y + (len(pile) - 1 - elem_idx) * (box_height + 2)
-                if elem_idx == len(pile) - 1:
-                    color = self.colors['pile_top']
-                    text_color = self.colors['text_dark']
-                else:
-                    color = self.colors['pile']
-                    text_color = 'white'
-                self.canvas.create_rectangle(
-                    x, y, x + box_width, y + box_height,
-                    fill=color,
-                    outline='white',
-                    width=2
-                )
-                self.canvas.create_text(
-                    x + box_width // 2, y + box_height // 2,
-                    text=str(value),
-                    font=('Arial', min(12, box_width // 4), 'bold'),
-                    fill=text_color
-                )
-
-        # Return the Y position just below the tallest pile
-        return start_y + max_pile_height + 30  # +30 for spacing
-    
-    def draw_sorted_array(self, start_y=400):
-        """Draw the final sorted array below the piles"""
-        if not self.sorted_array:
-            return
+        # Target pile outline, moved around instead of recreated
+        self.target_outline = self.canvas.create_rectangle(
+            0, 0, 0, 0,
+            fill='',
+            outline=self.colors['highlight'],
+            width=3,
+            state=tk.HIDDEN
+        )
+        self.perf.add('items_created', 2)
+        if self.overview:
+            self.overview_image = tk.PhotoImage(width=OVERVIEW_WIDTH, height=OVERVIEW_HEIGHT)
+            overview = self.canvas.create_image(30, self.piles_start_y, image=self.overview_image, anchor=tk.NW)
+            self.canvas.tag_bind(overview, '<Button-1>', self.zoom_to_pile)
+            self.perf.add('items_created')
+            self.reset_overview()
+            self.draw_overview()
+        elif engine.current_phase == PHASE_PLACE:
+            self.move_target_outline(engine.target_pile)
+
+    def piles_title_text(self) -> str:
+        count = len(self.engine.pile_sizes)
+        if self.overview:
+            return f"Piles ({count:,} piles, overview - click a column to zoom in):"
+        return f"Piles ({count} piles):"
+
+    def overview_columns(self) -> int:
+        return min(OVERVIEW_WIDTH, self.overview_piles)
+
+    def overview_column(self, pile_idx: int) -> int:
+        """Overview column whose bucket holds pile_idx"""
+        return ((pile_idx + 1) * self.overview_columns() - 1) // self.overview_piles
+
+    def overview_bucket(self, column: int):
+        """(first, last) pile indices of an overview column, last exclusive"""
+        columns = self.overview_columns()
+        return column * self.overview_piles // columns, (column + 1) * self.overview_piles // columns
 
-        start_x = 30
-        box_width = min(50, (1090 - 60) // len(self.sorted_array))
-        box_height = 35
-        spacing = 3
+    def overview_heights(self, column: int):
+        """(tallest pile, tallest unmerged part) of an overview column's bucket"""
+        engine = self.engine
+        first, last = self.overview_bucket(column)
+        sizes = engine.pile_sizes[first:last]
+        total = max(sizes, default=0)
+        taken = engine.merge_taken[first:last]
+        remaining = max(map(operator.sub, sizes, taken), default=0) if taken else total
+        return total, remaining
+
+    def reset_overview(self):
+        """Recompute the per-column aggregates of the overview from the engine state"""
+        columns = range(self.overview_columns())
+        heights = [self.overview_heights(column) for column in columns]
+        self.overview_totals = [total for total, _ in heights]
+        self.overview_remaining = [remaining for _, remaining in heights]
+        self.overview_dirty = None
+        self.overview_target = -1
+
+    def update_overview(self, event: StepEvent):
+        """Fold a placement or pop into the overview column aggregates
+
+        Placements only grow a pile, so the column maximum is updated in
+        place. A pop only rescans its own bucket, and only when it shrank
+        the pile that was the tallest unmerged part of the column.
+        """
+        engine = self.engine
+        if event.kind == EVENT_PLACE:
+            if event.pile >= self.overview_piles:
+                # No recorded run to bucket for: rebucket for the grown pile set
+                self.overview_piles = len(engine.pile_sizes)
+                self.reset_overview()
+                return
+            column = self.overview_column(event.pile)
+            size = engine.pile_sizes[event.pile]
+            if size > self.overview_totals[column]:
+                self.overview_totals[column] = size
+                self.overview_remaining[column] = size
+                self.mark_overview(column)
+        elif event.kind == EVENT_POP:
+            column = self.overview_column(event.pile)
+            remaining = engine.pile_sizes[event.pile] - engine.merge_taken[event.pile]
+            if remaining + 1 == self.overview_remaining[column]:
+                self.overview_remaining[column] = self.overview_heights(column)[1]
+                self.mark_overview(column)
 
-        elements_per_row = 1090 // (box_width + spacing)
-        if len(self.sorted_array) > elements_per_row:
-            elements_per_row = elements_per_row
+    def mark_overview(self, column: int):
+        if self.overview_dirty is not None:
+            self.overview_dirty.add(column)
+
+    @timed('draw_overview')
+    def draw_overview(self):
+        """Paint the pile heights into the overview image
+
+        Every column stands for a bucket of adjacent piles and shows the
+        tallest of them, scaled to the tallest final pile: the part still
+        on the piles in the pile color, the part already merged in gray.
+        Only the columns changed since the last paint are repainted, with
+        a few rectangle puts each, so a step costs the same for any n.
+        """
+        engine = self.engine
+        target = self.overview_column(engine.target_pile) if engine.current_phase == PHASE_PLACE else -1
+        full = self.overview_dirty is None
+        if full:
+            self.overview_image.put(self.colors['card_bg'], to=(0, 0, OVERVIEW_WIDTH, OVERVIEW_HEIGHT))
+            self.overview_target = target
+            columns = range(self.overview_columns())
         else:
-            elements_per_row = len(self.sorted_array)
+            if target != self.overview_target:
+                self.overview_dirty.update(column for column in (self.overview_target, target) if column >= 0)
+                self.overview_target = target
+            columns = sorted(self.overview_dirty)
+        self.overview_dirty = set()
+        for column in columns:
+            self.paint_overview_column(column, clear=not full)
 
-        # Label
-        self.canvas.create_text(
-            start_x, start_y - 18,
-            text=f"Sorted Result ({len(self.sorted_array)} elements):",
+    def paint_overview_column(self, column: int, clear: bool):
+        """Paint one overview column, clearing its old bar first when clear is set"""
+        image = self.overview_image
+        column_width = OVERVIEW_WIDTH // self.overview_columns()
+        bar_width = column_width - 1 if column_width > 2 else column_width
+        scale = OVERVIEW_HEIGHT / self.overview_tallest
+        x0 = column * column_width
+        x1 = x0 + bar_width
+        if clear:
+            image.put(self.colors['card_bg'], to=(x0, 0, x1, OVERVIEW_HEIGHT))
+        total_y = min(OVERVIEW_HEIGHT, math.ceil(self.overview_totals[column] * scale))
+        remaining_y = min(OVERVIEW_HEIGHT, math.ceil(self.overview_remaining[column] * scale))
+        if column == self.overview_target:
+            image.put(self.colors['highlight'], to=(x0, 0, x1, max(total_y, 4)))
+            return
+        if remaining_y:
+            image.put(self.colors['pile'], to=(x0, 0, x1, remaining_y))
+        if total_y > remaining_y:
+            image.put('#666666', to=(x0, remaining_y, x1, total_y))
+
+    def zoom_to_pile(self, event):
+        """Switch from the overview to the cell view, scrolled to the clicked pile"""
+        count = len(self.engine.pile_sizes)
+        if not count:
+            return
+        columns = self.overview_columns()
+        column = int(self.canvas.canvasx(event.x) - 30) // (OVERVIEW_WIDTH // columns)
+        pile_idx = min(count - 1, self.overview_bucket(min(columns - 1, max(0, column)))[0])
+        self.pile_view_var.set("Cells")
+        self.draw_visualization()
+        width, height = self.scroll_size()
+        x, _, _, _ = self.pile_box(pile_idx, 0)
+        self.canvas.xview_moveto(max(0, x - 200) / width)
+        self.canvas.yview_moveto((self.piles_start_y - 40) / height)
+        self.sync_viewport()
+        self.update_status(f"🔎 Zoomed in on pile {pile_idx + 1:,} of {count:,}. "
+                           f"Choose 'Auto' or 'Overview' to zoom out again.")
+
+    def create_pile_label(self, pile_idx):
+        """Create the "P<n>" label above a pile"""
+        x, _, width, _ = self.pile_box(pile_idx, 0)
+        self.pile_labels[pile_idx] = self.canvas.create_text(
+            x + width // 2, self.piles_start_y - 5,
+            text=f"P{pile_idx + 1}",
+            font=('Arial', 10),
+            fill=self.colors['text']
+        )
+        self.perf.add('items_created')
+
+    def move_target_outline(self, pile_idx):
+        """Outline the pile the current element is about to be placed on"""
+        sizes = self.engine.pile_sizes
+        depth = sizes[pile_idx] if pile_idx < len(sizes) else 0
+        x, y, width, _ = self.pile_box(pile_idx, 0)
+        self.canvas.coords(
+            self.target_outline,
+            x - 3, y - 3,
+            x + width + 3, y + (depth + 1) * (30 + 2) + 3
+        )
+        self.canvas.itemconfig(self.target_outline, state=tk.NORMAL)
+
+    def draw_sorted_array(self):
+        """Draw the title of the sorted array below the piles"""
+        self.sorted_title = self.canvas.create_text(
+            30, self.sorted_start_y() - 18,
+            text=f"Sorted Result ({self.engine.sorted_count} elements):",
             font=('Arial', 12, 'bold'),
             fill=self.colors['text'],
             anchor=tk.W
         )
+        self.perf.add('items_created')
 
-        for i, value in enumerate(self.sorted_array):
-            row = i // elements_per_row
-            col = i % elements_per_row
-            x = start_x + col * (box_width + spacing)
-            y = start_y + row * (box_height + spacing + 3)
+    def update_scrollregion(self, event=None):
+        """Set the scroll region from the layout instead of a bbox("all") scan"""
+        if not getattr(self, 'layout_ready', False):
+            self.canvas.configure(scrollregion=(0, 0, 1150, 500))
+            return
+        width, height = self.scroll_size()
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+        if event is not None:
+            self.schedule_sync()
 
-            self.canvas.create_rectangle(
-                x, y, x + box_width, y + box_height,
-                fill=self.colors['sorted'],
-                outline='white',
-                width=2
+    def scroll_size(self):
+        """Width and height of the laid out canvas content"""
+        if self.overview:
+            width = 30 + OVERVIEW_WIDTH + 30
+        else:
+            width = 30 + len(self.engine.pile_sizes) * (45 + 15) + 30
+        height = self.sorted_start_y()
+        if self.engine.merge_started:
+            height += self.grid_height(self.engine.sorted_count)
+        return max(1150, width), height + 30
+
+    def toggle_overlay(self):
+        """Show or hide the live performance overlay"""
+        if self.overlay_job is not None:
+            self.root.after_cancel(self.overlay_job)
+            self.overlay_job = None
+        if self.overlay_var.get():
+            self.overlay_tick()
+        else:
+            self.canvas.delete('perf_overlay')
+            self.overlay_items = None
+
+    def overlay_tick(self):
+        """Refresh the overlay a few times per second while it is enabled"""
+        self.overlay_job = None
+        if not self.overlay_var.get():
+            return
+        self.draw_overlay()
+        self.overlay_job = self.root.after(250, self.overlay_tick)
+
+    def draw_overlay(self):
+        """Draw the counters in the top left corner of the visible canvas area"""
+        if not self.overlay_var.get():
+            return
+        x, y = self.canvas.canvasx(10), self.canvas.canvasy(10)
+        text = "\n".join(self.perf_lines())
+        if self.overlay_items is None:
+            background = self.canvas.create_rectangle(
+                0, 0, 0, 0,
+                fill='#11111b',
+                outline=self.colors['highlight'],
+                tags=('perf_overlay',)
             )
-            self.canvas.create_text(
-                x + box_width // 2, y + box_height // 2,
-                text=str(value),
-                font=('Arial', min(14, box_width // 3), 'bold'),
-                fill=self.colors['text_dark']
+            label = self.canvas.create_text(
+                0, 0,
+                font=('Consolas', 9),
+                fill=self.colors['sorted'],
+                anchor=tk.NW,
+                justify=tk.LEFT,
+                tags=('perf_overlay',)
             )
+            self.overlay_items = (background, label)
+        background, label = self.overlay_items
+        self.canvas.coords(label, x + 8, y + 6)
+        self.canvas.itemconfig(label, text=text)
+        x0, y0, x1, y1 = self.canvas.bbox(label)
+        self.canvas.coords(background, x0 - 8, y0 - 6, x1 + 8, y1 + 6)
+        self.canvas.tag_raise('perf_overlay')
+
+    def recorded_counters(self) -> PerfCounters:
+        """Counters of the recorded run, empty until it has been recorded"""
+        return self.engine.trace.counters if self.engine.has_trace else PerfCounters()
+
+    def recorded_comparisons(self) -> int:
+        """Pile-top comparisons of the recorded run, derived on first use"""
+        return self.engine.trace.comparisons if self.engine.has_trace else 0
+
+    def perf_lines(self):
+        """Lines of the overlay: recorded and replayed work, canvas item churn and wall times"""
+        engine = self.engine.counters
+        recorded = self.recorded_counters()
+        gui = self.perf
+        cache = self.trace_cache.stats()
+
+        def ms(*names):
+            return f"{sum(counters.time(name) for counters in (engine, gui) for name in names) * 1000:,.0f}"
+
+        return [
+            f"recorded run: pile-top comparisons {self.recorded_comparisons():,}   "
+            f"piles {recorded['piles_created']:,}   merge pops {recorded['merge_pops']:,}   "
+            f"place {recorded.time('place') * 1000:,.0f} ms   merge {recorded.time('merge') * 1000:,.0f} ms",
+            f"replayed: steps {engine['steps']:,}   seeks {engine['seeks']:,}   "
+            f"piles created {engine['piles_created']:,}   merge pops {engine['merge_pops']:,}",
+            f"canvas items +{gui['items_created']:,} / -{gui['items_deleted']:,}   "
+            f"recycled {gui['cells_recycled']:,}   full redraws {gui['full_redraws']:,}",
+            f"engine ms (incl. canvas): select {ms(EVENT_SELECT)}   find {ms(EVENT_FIND)}   "
+            f"place {ms(EVENT_PLACE)}   merge {ms(EVENT_MERGE_START, EVENT_POP)}   seek {ms('seek')}",
+            f"draw ms: full redraw {ms('draw_visualization')}   refresh {ms('refresh_canvas')}   "
+            f"viewport sync {ms('sync_viewport')}   overview {ms('draw_overview')}",
+            f"run cache: {cache['hits']:,} hits   {cache['misses']:,} misses   {cache['evictions']:,} evictions   "
+            f"{cache['entries']:,} runs in {format_bytes(cache['bytes'])}",
+        ]
+
+    def perf_summary(self) -> str:
+        """One line summary of the run's counters for the status line"""
+        recorded = self.recorded_counters()
+        gui = self.perf
+        return (f"📊 {self.recorded_comparisons():,} pile-top comparisons, {recorded['piles_created']:,} piles created, "
+                f"{recorded['merge_pops']:,} merge pops; {gui['items_created']:,} canvas items created, "
+                f"{gui['items_deleted']:,} deleted, {gui['full_redraws']:,} full redraws "
+                f"({gui.time('draw_visualization') * 1000:,.0f} ms).")
     
     def run(self):
         """Start the GUI application"""
@@ -792,19 +1713,30 @@ class PatienceSortVisualizer:
 
     def highlight_code_line(self, line_idx):
         """Highlight a specific line in the code display"""
+        if self.code_text is None:
+            return
         self.code_text.config(state=tk.NORMAL)
         self.code_text.tag_remove("highlight", "1.0", tk.END)
         self.code_text.tag_configure("highlight", background="#ffd700", foreground="#232136")
         self.code_text.tag_add("highlight", f"{line_idx+1}.0", f"{line_idx+1}.end")
         self.code_text.config(state=tk.DISABLED)
 
-def main():
-    """Main function to run the visualizer"""
+def main(argv=None):
+    """Run the visualizer, or the headless CLI when a command is given (see patience_cli)"""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        import patience_cli
+        return patience_cli.main(argv)
+    load_tk()
     try:
         app = PatienceSortVisualizer()
         app.run()
+    except tk.TclError as e:  # no display to show a message box on
+        print(f"Cannot start the visualizer: {e}", file=sys.stderr)
+        return 1
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred: {str(e)}")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""Benchmark for the patience sort pile pass.
+
+Compares the original linear pile scan with the bisection based PileSet on
+inputs whose pile count is controlled, so the crossover point between the
+two strategies is visible:
+
+    python benchmark.py --size 100000
+    python benchmark.py --size 1000000 --piles 1 16 256
+"""
+import argparse
+import random
+import time
+
+from patience_engine import build_piles
+
+
+def linear_build_piles(values):
+    """Pile pass with the original linear scan over all pile tops"""
+    piles = []
+    for value in values:
+        for pile in piles:
+            if pile[-1] >= value:
+                pile.append(value)
+                break
+        else:
+            piles.append([value])
+    return piles
+
+
+def make_input(size, pile_count, seed=0):
+    """Random input of size elements that produces about pile_count piles"""
+    rng = random.Random(seed)
+    return [rng.randint(1, pile_count) for _ in range(size)]
+
+
+def time_call(func, values):
+    """Return (seconds, pile count) for one run of func over values"""
+    start = time.perf_counter()
+    piles = func(values)
+    return time.perf_counter() - start, len(piles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Linear scan vs bisection pile placement")
+    parser.add_argument("--size", type=int, default=100000, help="number of elements per input")
+    parser.add_argument("--piles", type=int, nargs="+", default=[1, 4, 16, 64, 256, 1024],
+                        help="target pile counts to sweep")
+    parser.add_argument("--max-linear-work", type=float, default=5e8,
+                        help="skip the linear scan when size * piles exceeds this")
+    args = parser.parse_args()
+
+    print(f"{'piles':>8} {'linear (s)':>12} {'bisect (s)':>12} {'speedup':>9}")
+    for pile_count in args.piles:
+        values = make_input(args.size, pile_count)
+        bisect_time, piles = time_call(build_piles, values)
+        if args.size * piles <= args.max_linear_work:
+            linear_time, _ = time_call(linear_build_piles, values)
+            print(f"{piles:>8} {linear_time:>12.4f} {bisect_time:>12.4f} {linear_time / bisect_time:>8.2f}x")
+        else:
+            print(f"{piles:>8} {'skipped':>12} {bisect_time:>12.4f} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Benchmark suite for the patience sort engines.
+
+Times pile construction and reconstruction separately for every engine
+variant, over several input distributions and sizes, against sorted() as
+the baseline. Peak memory of every run is measured with tracemalloc in a
+separate untimed pass, and the results can be written as JSON to track
+regressions. --startup also measures the cold start of every module
+(import time in a fresh interpreter) and of the visualizer (import until
+the first paint, when a display is available):
+
+    python benchmark_suite.py
+    python benchmark_suite.py --sizes 1000 1000000 10000000 --json results.json
+    python benchmark_suite.py --distributions random nearly-sorted --variants bisect numpy
+    python benchmark_suite.py --startup --sizes 1000
+"""
+import argparse
+import gc
+import heapq
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from array import array
+
+from benchmark import linear_build_piles
+from patience_engine import MIN_RUN, build_piles, merge_piles
+import patience_numpy
+
+np = patience_numpy.np
+
+
+def make_distribution(name, size, seed=0):
+    """Integer input of the named distribution, as an int64 array"""
+    rng = random.Random(seed)
+    if name == "random":
+        values = (rng.randrange(1, 2 ** 31) for _ in range(size))
+    elif name == "sorted":
+        values = range(1, size + 1)
+    elif name == "reversed":
+        values = range(size, 0, -1)
+    elif name == "few-unique":
+        values = (rng.randint(1, 8) for _ in range(size))
+    elif name == "sawtooth":
+        tooth = max(2, int(size ** 0.5))
+        values = (i % tooth + 1 for i in range(size))
+    elif name == "nearly-sorted":
+        values = array('q', range(1, size + 1))
+        for _ in range(size // 100):
+            i, j = rng.randrange(size), rng.randrange(size)
+            values[i], values[j] = values[j], values[i]
+    else:
+        raise ValueError(f"unknown distribution {name!r}")
+    return array('q', values)
+
+
+DISTRIBUTIONS = ("random", "sorted", "reversed", "few-unique", "sawtooth", "nearly-sorted")
+
+
+# Every variant is (build, merge): build(values) returns the piles and
+# merge(piles) the sorted output, so both phases are timed on their own.
+
+def _heapq_merge(pile_set):
+    return list(heapq.merge(*(reversed(pile) for pile in pile_set)))
+
+
+def _numpy_build(values):
+    flat = np.frombuffer(values, dtype=np.int64)
+    placement, pile_count = patience_numpy.place_elements(flat)
+    return patience_numpy.pile_layout(flat, placement, pile_count)
+
+
+def _numpy_merge(layout):
+    return patience_numpy.merge_piles(*layout)[0]
+
+
+VARIANTS = {
+    "sorted": (lambda values: values, sorted),
+    "linear": (linear_build_piles, _heapq_merge),
+    "bisect": (build_piles, merge_piles),
+    "bisect+heapq.merge": (build_piles, _heapq_merge),
+    "adaptive": (lambda values: build_piles(values, MIN_RUN), merge_piles),
+}
+if np is not None:
+    VARIANTS["numpy"] = (_numpy_build, _numpy_merge)
+
+
+STARTUP_MODULES = ("patience_engine", "patience_io", "patience_cli", "Patience_Sort_GUI")
+IMPORT_SCRIPT = "import time; started = time.perf_counter(); import {0}; print(time.perf_counter() - started)"
+FIRST_PAINT_SCRIPT = """import time
+started = time.perf_counter()
+import Patience_Sort_GUI
+app = Patience_Sort_GUI.PatienceSortVisualizer()
+app.root.update()
+print(time.perf_counter() - started)
+app.root.destroy()
+"""
+
+
+def startup_time(script, repeat):
+    """Best seconds printed by script over repeat fresh interpreters, None if it fails"""
+    best = None
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__)))
+        if process.returncode:
+            return None
+        seconds = float(process.stdout.split()[-1])
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def measure_startup(repeat):
+    """Cold import time of every module and import-to-first-paint of the visualizer"""
+    startup = {f"import {module}": startup_time(IMPORT_SCRIPT.format(module), repeat)
+               for module in STARTUP_MODULES}
+    startup["first paint"] = startup_time(FIRST_PAINT_SCRIPT, repeat)  # None without a display
+    return startup
+
+
+def pile_count(piles):
+    """Number of piles in the result of a build function"""
+    if isinstance(piles, tuple):  # numpy layout (values, offsets, lengths)
+        return len(piles[1])
+    if isinstance(piles, array):  # sorted() baseline has no piles
+        return 0
+    return len(piles)
+
+
+def run_variant(variant, values, repeat):
+    """Best (build, merge) seconds over repeat runs, the pile count and the output"""
+    build, merge = VARIANTS[variant]
+    best_build = best_merge = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        piles = build(values)
+        built = time.perf_counter()
+        output = merge(piles)
+        done = time.perf_counter()
+        best_build = min(best_build, built - start)
+        best_merge = min(best_merge, done - built)
+    return best_build, best_merge, pile_count(piles), output
+
+
+def peak_memory(variant, values):
+    """Peak bytes allocated while building and merging, from tracemalloc"""
+    build, merge = VARIANTS[variant]
+    gc.collect()
+    tracemalloc.start()
+    try:
+        merge(build(values))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Patience sort engine benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--distributions", nargs="+", default=list(DISTRIBUTIONS), choices=DISTRIBUTIONS)
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best is kept")
+    parser.add_argument("--max-linear-work", type=float, default=5e8,
+                        help="skip the linear scan when size * piles exceeds this")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--startup", action="store_true", help="also measure module import and first paint times")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="write the results to PATH as JSON")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'distribution':<14} {'size':>10} {'variant':<19} {'build (s)':>10} {'merge (s)':>10} "
+          f"{'piles':>9} {'Mops/s':>8} {'vs sorted':>9} {'peak MB':>8}")
+    for distribution in args.distributions:
+        for size in args.sizes:
+            values = make_distribution(distribution, size, args.seed)
+            expected = sorted(values)
+            baseline = sum(run_variant("sorted", values, args.repeat)[:2])
+            # The pile count of the plain pile pass bounds the linear scan's work
+            piles = len(build_piles(values))
+            for variant in args.variants:
+                if variant == "linear" and size * piles > args.max_linear_work:
+                    continue
+                build_s, merge_s, variant_piles, output = run_variant(variant, values, args.repeat)
+                if list(output) != expected:
+                    raise SystemExit(f"{variant} did not sort {distribution} input of size {size}")
+                total = build_s + merge_s
+                peak = None if args.no_memory else peak_memory(variant, values)
+                result = {
+                    "distribution": distribution,
+                    "size": size,
+                    "variant": variant,
+                    "build_seconds": build_s,
+                    "merge_seconds": merge_s,
+                    "total_seconds": total,
+                    "piles": variant_piles,
+                    "ops_per_second": size / total if total else None,
+                    "vs_sorted": total / baseline,
+                    "peak_bytes": peak,
+                }
+                results.append(result)
+                ratio = f"{result['vs_sorted']:.1f}x"
+                ops = f"{result['ops_per_second'] / 1e6:.2f}" if total else "-"
+                memory = f"{peak / 2 ** 20:.1f}" if peak is not None else "-"
+                print(f"{distribution:<14} {size:>10,} {variant:<19} {build_s:>10.4f} {merge_s:>10.4f} "
+                      f"{variant_piles:>9,} {ops:>8} {ratio:>9} {memory:>8}")
+
+    startup = None
+    if args.startup:
+        startup = measure_startup(args.repeat)
+        print(f"\n{'startup':<32} {'ms':>8}")
+        for name, seconds in startup.items():
+            shown = f"{seconds * 1000:.1f}" if seconds is not None else "-"
+            print(f"{name:<32} {shown:>8}")
+
+    if args.json:
+        report = {
+            "python": sys.version.split()[0],
+            "numpy": np.__version__ if np is not None else None,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "results": results,
+            "startup": startup,
+        }
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"wrote {len(results)} results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
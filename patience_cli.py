@@ -0,0 +1,210 @@
+"""Headless command line interface for the patience sort engines.
+
+Sorts integer files or stdin without importing tkinter, writes the sorted
+values as text lines or raw int64, and optionally writes run statistics
+as JSON and the step trace as JSON or NDJSON, e.g. for offline analysis
+or for failing a CI job on a performance regression:
+
+    python Patience_Sort_GUI.py sort --input data.bin --engine bisect --stats
+    python patience_cli.py sort --input data.txt --output sorted.bin --stats stats.json
+    seq 100 -1 1 | python patience_cli.py sort --trace steps.ndjson > sorted.txt
+    python patience_cli.py sort --input data.npy --limit 100 --max-seconds 2.5
+    python patience_cli.py sort --input data.bin --output /dev/null --replay data.psr
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from array import array
+from typing import List, Optional
+
+from patience_engine import MIN_RUN, PatienceSortEngine, SortTrace, build_piles, merge_piles
+from patience_io import iter_chunks, parse_text
+from patience_replay import write_replay
+import patience_numpy
+
+ENGINES = ("bisect", "adaptive", "numpy")
+TEXT_EXTENSIONS = ('.txt', '.csv')
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+BLOCK_VALUES = 1 << 16  # values written per block
+
+
+def load_input(path: str) -> array:
+    """Read the integers of path, or of stdin as text when path is "-" """
+    if path == '-':
+        return parse_text(sys.stdin.buffer.read())
+    values = array('q')
+    for chunk in iter_chunks(path):
+        values.extend(chunk)
+    return values
+
+
+def sort_values(values: array, engine: str, limit: Optional[int] = None):
+    """Return (sorted values, pile count, build seconds, merge seconds)
+
+    With limit only the limit smallest values are merged.
+    """
+    stop = len(values) if limit is None else min(limit, len(values))
+    if engine == "numpy":
+        np = patience_numpy.np
+        if np is None:
+            raise ValueError("The numpy engine requires NumPy.")
+        started = time.perf_counter()
+        flat = np.frombuffer(values, dtype=np.int64)
+        placement, pile_count = patience_numpy.place_elements(flat)
+        layout = patience_numpy.pile_layout(flat, placement, pile_count)
+        built = time.perf_counter()
+        output = patience_numpy.merge_piles(*layout)[0][:stop]
+        return output.tolist(), pile_count, built - started, time.perf_counter() - built
+
+    started = time.perf_counter()
+    piles = build_piles(values, MIN_RUN if engine == "adaptive" else 0)
+    built = time.perf_counter()
+    output = merge_piles(piles) if limit is None else piles.sorted_slice(0, stop)
+    return output, len(piles), built - started, time.perf_counter() - built
+
+
+def write_values(values, path: str, binary: bool):
+    """Write values to path ("-" for stdout) as text lines or little-endian int64"""
+    file = sys.stdout.buffer if path == '-' else open(path, 'wb')
+    try:
+        for start in range(0, len(values), BLOCK_VALUES):
+            block = values[start:start + BLOCK_VALUES]
+            if binary:
+                block = array('q', block)
+                if sys.byteorder == 'big':
+                    block.byteswap()
+                file.write(block.tobytes())
+            else:
+                file.write(('\n'.join(map(str, block)) + '\n').encode('ascii'))
+    finally:
+        if file is sys.stdout.buffer:
+            file.flush()
+        else:
+            file.close()
+
+
+def write_trace(values: array, path: str, limit: Optional[int] = None,
+                trace: Optional[SortTrace] = None) -> int:
+    """Write every step event of the visualizer's run over values, return the count
+
+    .ndjson and .jsonl paths get one JSON object per line, anything else a
+    single JSON document. trace is the run's SortTrace if it was recorded
+    already, otherwise it is recorded here.
+    """
+    engine = PatienceSortEngine(values)
+    if trace is not None:
+        engine.set_trace(trace)
+    engine.set_merge_limit(limit)
+    ndjson = os.path.splitext(path)[1].lower() in NDJSON_EXTENSIONS
+    count = 0
+    with open(path, 'w') as file:
+        if not ndjson:
+            file.write('{"values": %d, "piles": %d, "events": [\n' % (len(values), engine.trace.pile_count))
+        while not engine.is_finished:
+            step = engine.position
+            for event in engine.step():
+                record = event._asdict()
+                record['step'] = step
+                if ndjson:
+                    file.write(json.dumps(record) + '\n')
+                else:
+                    file.write((',\n' if count else '') + json.dumps(record))
+                count += 1
+        if not ndjson:
+            file.write('\n]}\n')
+    return count
+
+
+def sort_command(args) -> int:
+    started = time.perf_counter()
+    values = load_input(args.input)
+    loaded = time.perf_counter()
+    output, pile_count, build_s, merge_s = sort_values(values, args.engine, args.limit)
+    sorted_at = time.perf_counter()
+
+    if args.format == "auto":
+        binary = args.output != '-' and os.path.splitext(args.output)[1].lower() not in TEXT_EXTENSIONS
+    else:
+        binary = args.format == "binary"
+    write_values(output, args.output, binary)
+    written = time.perf_counter()
+
+    # The trace and the replay share one recording of the run
+    trace = SortTrace(values) if args.trace or args.replay else None
+    events = write_trace(values, args.trace, args.limit, trace) if args.trace else None
+    if args.replay:
+        write_replay(args.replay, values, trace)
+    sort_s = build_s + merge_s
+    stats = {
+        "engine": args.engine,
+        "values": len(values),
+        "output_values": len(output),
+        "piles": pile_count,
+        "seconds": {
+            "load": loaded - started,
+            "build": build_s,
+            "merge": merge_s,
+            "sort": sort_s,
+            "write": written - sorted_at,
+            "total": time.perf_counter() - started,
+        },
+        "values_per_second": len(values) / sort_s if sort_s else None,
+        "trace_events": events,
+        "python": sys.version.split()[0],
+        "numpy": patience_numpy.np.__version__ if patience_numpy.np is not None else None,
+        "platform": platform.platform(),
+    }
+    if args.stats == '-':
+        print(json.dumps(stats, indent=2), file=sys.stderr)
+    elif args.stats:
+        with open(args.stats, 'w') as file:
+            json.dump(stats, file, indent=2)
+
+    if args.max_seconds is not None and sort_s > args.max_seconds:
+        print(f"sorting took {sort_s:.3f}s, over the limit of {args.max_seconds:.3f}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="patience", description="Headless patience sort")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sort = commands.add_parser("sort", help="sort an integer file or stdin")
+    sort.add_argument("--input", default='-',
+                      help="text (.csv/.txt/other), .npy or raw int64 (.bin/.raw/.i64/.int64) file; "
+                           "default: text on stdin")
+    sort.add_argument("--output", default='-', help="output file, default: stdout")
+    sort.add_argument("--format", choices=("auto", "text", "binary"), default="auto",
+                      help="output format; auto writes text to stdout and .txt/.csv files, "
+                           "raw little-endian int64 otherwise")
+    sort.add_argument("--engine", choices=ENGINES, default="bisect")
+    sort.add_argument("--limit", type=int, default=None, metavar="K", help="output only the K smallest values")
+    sort.add_argument("--stats", nargs='?', const='-', default=None, metavar="PATH",
+                      help="write run statistics as JSON to PATH (stderr without PATH)")
+    sort.add_argument("--trace", default=None, metavar="PATH",
+                      help="write every step event as JSON (NDJSON for .ndjson/.jsonl)")
+    sort.add_argument("--replay", default=None, metavar="PATH",
+                      help="save the recorded run as a replay file for the visualizer (.psr)")
+    sort.add_argument("--max-seconds", type=float, default=None,
+                      help="exit with status 1 when sorting takes longer than this")
+    sort.set_defaults(run=sort_command)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.limit is not None and args.limit < 0:
+        parser.error("--limit must not be negative")
+    try:
+        return args.run(args)
+    except (OSError, ValueError) as error:
+        print(f"error: {error}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
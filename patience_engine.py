@@ -0,0 +1,1381 @@
+"""Pile engine for the Patience Sort visualizer.
+
+The tops of all piles are kept in a separate sorted list, so the target
+pile of every element is found by bisection in O(log k) instead of a
+linear scan over the k piles. The sorted output is reconstructed with a
+heap over the pile tops in O(n log k).
+"""
+import bisect
+import hashlib
+import heapq
+import itertools
+import sys
+import time
+from array import array
+from collections import OrderedDict
+import queue
+import threading
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import patience_numpy
+
+
+class PileSet:
+    """Patience sort piles with a maintained sorted array of pile tops"""
+
+    def __init__(self):
+        self.piles: List[list] = []
+        self.tops: list = []  # tops[i] == piles[i][-1], always non-decreasing
+        # piles beyond len(tops) are ready-made runs added by add_run()
+
+    def __len__(self):
+        return len(self.piles)
+
+    def __iter__(self):
+        return iter(self.piles)
+
+    def __getitem__(self, index):
+        return self.piles[index]
+
+    def find_pile(self, value) -> int:
+        """Return the leftmost pile whose top is >= value, or len(self) if none"""
+        return bisect.bisect_left(self.tops, value)
+
+    def place(self, value, pile_idx: int = None) -> int:
+        """Place value on pile pile_idx (searched if omitted) and return the pile index"""
+        if pile_idx is None:
+            pile_idx = bisect.bisect_left(self.tops, value)
+        if pile_idx == len(self.piles):
+            self.piles.append([value])
+            self.tops.append(value)
+        else:
+            self.piles[pile_idx].append(value)
+            self.tops[pile_idx] = value
+        return pile_idx
+
+    def add_run(self, run):
+        """Append a ready-made pile, non-increasing from bottom to top
+
+        Ready-made piles are only merged, never placed on, so they must be
+        added after the last call to place().
+        """
+        self.piles.append(run)
+
+    def iter_merge(self):
+        """Yield (pile index, value) in ascending order without modifying the piles
+
+        Each pile is non-increasing from bottom to top, so a heap over the
+        current top of every pile gives the next smallest value in O(log k).
+        Piles are read through a per-pile cursor instead of being copied.
+        """
+        piles = self.piles
+        heap = [(pile[-1], i, len(pile) - 1) for i, pile in enumerate(piles)]
+        heapq.heapify(heap)
+        while heap:
+            value, i, pos = heap[0]
+            if pos:
+                heapq.heapreplace(heap, (piles[i][pos - 1], i, pos - 1))
+            else:
+                heapq.heappop(heap)
+            yield i, value
+
+    def sorted_slice(self, start: int, stop: int) -> list:
+        """Return the values of sorted ranks start .. stop - 1
+
+        The merge stops after stop heap steps over the pile tops, so the
+        slice costs O(piles + stop * log piles) on top of the pile pass
+        instead of a full merge. Ranks count from the smallest value, there
+        are no negative indices as in list slices.
+        """
+        if start < 0 or stop < 0:
+            raise ValueError(f"sorted_slice bounds must be non-negative ranks, got {start}, {stop}")
+        return [value for _, value in itertools.islice(self.iter_merge(), start, stop)]
+
+    def iter_range(self, low, high) -> Iterator:
+        """Yield the values v with low <= v < high in ascending order
+
+        Each pile is non-increasing, so its values >= low are a prefix
+        found by binary search; the merge starts at the end of every prefix
+        and stops at the first value >= high.
+        """
+        piles = self.piles
+        heap = []
+        for i, pile in enumerate(piles):
+            lo, hi = 0, len(pile)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if pile[mid] < low:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            if lo:
+                heap.append((pile[lo - 1], i, lo - 1))
+        heapq.heapify(heap)
+        while heap:
+            value, i, pos = heap[0]
+            if not value < high:
+                return
+            if pos:
+                heapq.heapreplace(heap, (piles[i][pos - 1], i, pos - 1))
+            else:
+                heapq.heappop(heap)
+            yield value
+
+
+MIN_RUN = 16  # shortest monotone stretch of the input used as a ready-made pile
+
+
+class RunCounter:
+    """Split values into the runs of find_runs() while scanning them piecewise
+
+    The input is split greedily into non-decreasing runs and, if descending
+    is set, strictly descending runs (strict, so reversing one never swaps
+    equal values). Runs of at least min_run elements are collected in runs
+    as (start, stop, is_descending).
+
+    scan(stop) advances the scan to values[:stop], so the runs can be found
+    alongside another chunked pass over the input (and be reported and
+    cancelled with it) instead of in a pass of their own.
+    """
+
+    def __init__(self, values, min_run: int = MIN_RUN, descending: bool = True):
+        self.values = values
+        self.min_run = min_run
+        self.descending = descending
+        self.runs: List[Tuple[int, int, bool]] = []
+        self.start = 0  # first element of the open run
+        self.pos = 1  # next element to compare with its predecessor
+        self.is_descending = None  # direction of the open run, None until its second element
+        self.finished = len(values) == 0
+
+    def scan(self, stop: int):
+        """Extend the scan over values[:stop]"""
+        values = self.values
+        n = len(values)
+        stop = min(stop, n)
+        pos = self.pos
+        while pos < stop:
+            if self.is_descending is None:
+                self.is_descending = self.descending and values[pos] < values[self.start]
+            if self.is_descending:
+                while pos < stop and values[pos] < values[pos - 1]:
+                    pos += 1
+            else:
+                while pos < stop and not values[pos] < values[pos - 1]:
+                    pos += 1
+            if pos < stop:
+                # values[pos] breaks the open run and starts the next one
+                self._close(pos)
+                self.start = pos
+                self.is_descending = None
+                pos += 1
+        self.pos = pos
+        if pos >= n and not self.finished:
+            self._close(n)
+            self.finished = True
+
+    def _close(self, stop: int):
+        if stop - self.start >= self.min_run:
+            self.runs.append((self.start, stop, bool(self.is_descending)))
+
+    @property
+    def run_count(self) -> int:
+        """Number of runs found, final once the whole input has been scanned"""
+        return len(self.runs)
+
+
+def find_runs(values, min_run: int = MIN_RUN, descending: bool = True) -> List[Tuple[int, int, bool]]:
+    """Return (start, stop, is_descending) for the maximal monotone runs of values
+
+    Only runs of at least min_run elements are returned (see RunCounter).
+    """
+    counter = RunCounter(values, min_run, descending)
+    counter.scan(len(values))
+    return counter.runs
+
+
+def run_gaps(runs: List[Tuple[int, int, bool]], n: int) -> List[Tuple[int, int]]:
+    """(start, stop) of the stretches of range(n) not covered by runs"""
+    edges = [0] + [edge for start, stop, _ in runs for edge in (start, stop)] + [n]
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def build_piles(values, min_run: int = 0, descending: bool = True) -> PileSet:
+    """Run the pile pass over values and return the resulting piles
+
+    With min_run > 0, monotone runs of at least min_run elements (see
+    find_runs) skip the pile pass and become ready-made piles, so presorted
+    and nearly sorted input costs O(n) plus a merge over few piles.
+    """
+    pile_set = PileSet()
+    piles = pile_set.piles
+    tops = pile_set.tops
+    bisect_left = bisect.bisect_left
+    runs = find_runs(values, min_run, descending) if min_run > 0 else []
+    for start, stop in run_gaps(runs, len(values)):
+        for value in values[start:stop]:
+            i = bisect_left(tops, value)
+            if i == len(tops):
+                piles.append([value])
+                tops.append(value)
+            else:
+                piles[i].append(value)
+                tops[i] = value
+    for start, stop, is_descending in runs:
+        run = list(values[start:stop])
+        if not is_descending:
+            run.reverse()
+        pile_set.add_run(run)
+    return pile_set
+
+
+def merge_piles(pile_set: PileSet) -> list:
+    """Return the sorted contents of pile_set using a k-way heap merge"""
+    return [value for _, value in pile_set.iter_merge()]
+
+
+def nsmallest(values, k: int, min_run: int = MIN_RUN) -> list:
+    """Return the k smallest values in ascending order
+
+    Runs the full pile pass but only k steps of the merge. As with
+    heapq.nsmallest, k <= 0 gives an empty list.
+    """
+    if k <= 0:
+        return []
+    return build_piles(values, min_run).sorted_slice(0, k)
+
+
+def stable_order(keys, min_run: int = MIN_RUN) -> List[int]:
+    """Return the indices that sort keys stably, using patience sort
+
+    Piles hold element indices. Each key goes on the leftmost pile whose
+    top key is greater (bisect_right), so equal keys never share a pile,
+    and the heap merge breaks ties on the element index. Runs of at least
+    min_run keys are used as ready-made piles as in build_piles. Keys are
+    only compared with <.
+    """
+    piles: List[list] = []
+    tops = []
+    bisect_right = bisect.bisect_right
+    runs = find_runs(keys, min_run) if min_run > 0 else []
+    for start, stop in run_gaps(runs, len(keys)):
+        for i in range(start, stop):
+            key = keys[i]
+            p = bisect_right(tops, key)
+            if p == len(tops):
+                piles.append([i])
+                tops.append(key)
+            else:
+                piles[p].append(i)
+                tops[p] = key
+    for start, stop, is_descending in runs:
+        # Piles are read from the top, so an ascending run is stored reversed
+        piles.append(list(range(start, stop)) if is_descending else list(range(stop - 1, start - 1, -1)))
+
+    # Heap entries are (key, index, pile, position); indices are unique, so
+    # neither two keys of equal value nor the items themselves are ever
+    # compared beyond the key
+    heap = [(keys[pile[-1]], pile[-1], p, len(pile) - 1) for p, pile in enumerate(piles)]
+    heapq.heapify(heap)
+    order = []
+    while heap:
+        _, i, p, pos = heap[0]
+        order.append(i)
+        if pos:
+            j = piles[p][pos - 1]
+            heapq.heapreplace(heap, (keys[j], j, p, pos - 1))
+        else:
+            heapq.heappop(heap)
+    return order
+
+
+def longest_increasing_subsequence(values, progress: Optional[Callable[[int], None]] = None,
+                                   report_every: int = 65536) -> List[int]:
+    """Indices of a longest strictly increasing subsequence of values
+
+    The pile pass places every element on pile p exactly when the longest
+    strictly increasing subsequence ending at it has p + 1 elements, so the
+    pile count is the LIS length. Each element keeps a back-pointer to the
+    element on top of pile p - 1 when it was placed (which is smaller), in a
+    flat index array, and the LIS is read back from the top of the last
+    pile in O(n log n) overall.
+
+    progress(done) is called every report_every elements; it may raise
+    SortCancelled to abort.
+    """
+    n = len(values)
+    index_code = index_typecode(n)
+    tops = []
+    top_index = array(index_code)
+    back = array(index_code, bytes(array(index_code).itemsize * n))
+    bisect_left = bisect.bisect_left
+    for start in range(0, n, report_every):
+        for i, value in enumerate(values[start:start + report_every], start):
+            p = bisect_left(tops, value)
+            back[i] = top_index[p - 1] if p else -1
+            if p == len(tops):
+                tops.append(value)
+                top_index.append(i)
+            else:
+                tops[p] = value
+                top_index[p] = i
+        if progress is not None:
+            progress(min(start + report_every, n))
+
+    indices = []
+    i = top_index[-1] if tops else -1
+    while i >= 0:
+        indices.append(i)
+        i = back[i]
+    indices.reverse()
+    return indices
+
+
+def longest_decreasing_subsequence(values, progress: Optional[Callable[[int], None]] = None,
+                                   report_every: int = 65536) -> List[int]:
+    """Indices of a longest strictly decreasing subsequence of values (progress as above)"""
+    last = len(values) - 1
+    return [last - i for i in reversed(longest_increasing_subsequence(values[::-1], progress, report_every))]
+
+
+# Phases of the step-by-step run. current_phase names the phase the next
+# call to PatienceSortEngine.step() will execute.
+PHASE_IDLE = "idle"
+PHASE_HIGHLIGHT = "highlight"
+PHASE_FIND_PILE = "find_pile"
+PHASE_PLACE = "place"
+PHASE_RECONSTRUCT = "reconstruct"
+
+# Events emitted to subscribers by PatienceSortEngine
+EVENT_SELECT = "select"            # element picked up from the input
+EVENT_FIND = "find"                # target pile found (pile == len(piles) for a new pile)
+EVENT_PLACE = "place"              # element placed on its pile
+EVENT_PILES_DONE = "piles_done"    # every element is on a pile
+EVENT_MERGE_START = "merge_start"  # reconstruction started
+EVENT_POP = "pop"                  # smallest top taken from a pile
+EVENT_DONE = "done"                # sorted array complete
+
+
+class StepEvent(NamedTuple):
+    """A single observable change of the engine state"""
+    kind: str
+    index: int = -1      # input index, or output position for EVENT_POP
+    value: object = None
+    pile: int = -1
+    new_pile: bool = False
+
+
+def compact_array(values, typecode: str = 'q'):
+    """Store values in a flat typed array, or a list if they do not fit typecode"""
+    if isinstance(values, array) and values.typecode == typecode:
+        return values  # already compact, e.g. straight from a file loader
+    if isinstance(values, memoryview) and values.format == typecode:
+        return values  # e.g. memory mapped from a replay file, never copied
+    try:
+        return array(typecode, values)
+    except (TypeError, OverflowError):
+        return list(values)
+
+
+def copy_array(values, typecode: str = 'q'):
+    """Like compact_array, but always a new buffer the caller's input does not share"""
+    if isinstance(values, memoryview) and values.format == typecode:
+        copy = array(typecode)
+        copy.frombytes(values.cast('B'))
+        return copy
+    copy = compact_array(values, typecode)
+    return copy[:] if copy is values else copy
+
+
+def index_typecode(count: int) -> str:
+    """Smallest array typecode able to hold indices below count"""
+    return 'i' if count < 2 ** 31 else 'q'
+
+
+def buffer_size(values) -> int:
+    """Bytes used by a flat array, or by a list and its elements"""
+    if isinstance(values, array):
+        return values.buffer_info()[1] * values.itemsize
+    if isinstance(values, memoryview):
+        return values.nbytes
+    return sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
+
+
+def format_bytes(size: int) -> str:
+    """Human readable byte count"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def bisect_probes(count: int, index: int) -> int:
+    """Number of comparisons bisect_left makes over count items to return index"""
+    probes = 0
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        probes += 1
+        if mid < index:
+            lo = mid + 1
+        else:
+            hi = mid
+    return probes
+
+
+def bisect_comparisons(placement, pile_count: int = 0) -> int:
+    """Pile-top comparisons the pile pass made to place elements on placement
+
+    pile_count is the number of piles before placement[0]. bisect_left
+    cannot count its own comparisons, but for a given pile count and
+    result they are fixed, so they are replayed here (vectorized for
+    larger inputs when NumPy is installed).
+    """
+    if len(placement) >= patience_numpy.MIN_SIZE and patience_numpy.np is not None:
+        return patience_numpy.bisect_comparisons(placement, pile_count)
+    total = 0
+    for pile_idx in placement:
+        total += bisect_probes(pile_count, pile_idx)
+        if pile_idx == pile_count:
+            pile_count += 1
+    return total
+
+
+class PerfCounters:
+    """Named counters and accumulated wall time, cheap enough for hot paths"""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+
+    def add(self, name: str, amount: int = 1):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def add_time(self, name: str, seconds: float):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def __getitem__(self, name: str) -> int:
+        return self.counts.get(name, 0)
+
+    def time(self, name: str) -> float:
+        return self.seconds.get(name, 0.0)
+
+    def reset(self):
+        self.counts.clear()
+        self.seconds.clear()
+
+    def snapshot(self) -> dict:
+        """Copy of all counters and timings, e.g. for logging as JSON"""
+        return {'counts': dict(self.counts), 'seconds': dict(self.seconds)}
+
+
+class SortCancelled(Exception):
+    """Raised from a progress callback to abort building a SortTrace"""
+
+
+# Stages reported while an input file is loaded and its SortTrace is built
+STAGE_LOAD = "load"
+STAGE_LOADED = "loaded"
+STAGE_PLACE = "place"
+STAGE_MERGE = "merge"
+STAGE_LDS = "lds"  # longest decreasing subsequence, searched by an LDSWorker
+STAGE_DONE = "done"
+STAGE_CANCELLED = "cancelled"
+STAGE_ERROR = "error"
+
+
+class SortTrace:
+    """Compact record of a complete patience sort run
+
+    All storage is flat typed arrays. The piles are one pile_values buffer
+    holding every pile bottom to top, addressed by pile_offsets and
+    pile_lengths. placement[i] is the pile element i was placed on and
+    pops[j] the pile the j-th smallest element was taken from. Every
+    checkpoint_interval placements (and pops) the pile sizes (and per-pile
+    pop counts) are stored, so the state after any step can be rebuilt by
+    replaying at most one interval of events from the nearest checkpoint.
+
+    int64 inputs are recorded with the patience_numpy kernels when NumPy is
+    installed; the result is identical to the pure Python pass.
+
+    run_count is the number of presorted runs (see find_runs) in the input,
+    which patience_sort() would use as ready-made piles.
+
+    counters (a PerfCounters) holds what the recording itself did: the
+    piles created, the merge pops and the seconds of the place and merge
+    passes. The pile-top comparisons of the pile pass are only derived from
+    placement when comparisons is first read.
+
+    from_fields() rebuilds a trace from stored fields instead of recording
+    it; any buffers that index and slice like arrays will do, such as the
+    memory mapped sections of a replay file (see patience_replay).
+    """
+
+    FIELDS = ('placement', 'pile_lengths', 'pile_offsets', 'pile_values', 'pops', 'sorted_output',
+              'checkpoint_interval', 'pile_checkpoints', 'merge_checkpoints', 'run_count')
+
+    COUNTERS = ('piles_created', 'merge_pops')
+    TIMES = ('place', 'merge')
+
+    def __init__(self, values, checkpoint_interval: int = 1024,
+                 progress: Optional[Callable[[str, int, int, int], None]] = None,
+                 report_every: int = 65536, use_numpy: Optional[bool] = None):
+        """Record the run over values
+
+        progress(stage, done, total, pile_count) is called every
+        report_every elements of the pile pass (stage "place") and of the
+        merge (stage "merge"); it may raise SortCancelled to abort.
+        use_numpy forces or disables the NumPy kernels (default: automatic).
+        """
+        n = len(values)
+        index_code = index_typecode(n)
+        self.counters = PerfCounters()
+        if use_numpy is None:
+            use_numpy = (n >= patience_numpy.MIN_SIZE and patience_numpy.np is not None
+                         and isinstance(values, array) and values.typecode == 'q')
+        if use_numpy:
+            self._record_numpy(values, index_code, checkpoint_interval, progress, report_every)
+            return
+
+        # Pile pass: only the tops are needed to place every element; the
+        # presorted runs are counted along with it, chunk by chunk
+        counters = self.counters
+        tops = []
+        placement = array(index_code)
+        runs = RunCounter(values)
+        bisect_left = bisect.bisect_left
+        for start in range(0, n, report_every):
+            started = time.perf_counter()
+            for value in values[start:start + report_every]:
+                i = bisect_left(tops, value)
+                if i == len(tops):
+                    tops.append(value)
+                else:
+                    tops[i] = value
+                placement.append(i)
+            counters.add_time('place', time.perf_counter() - started)
+            runs.scan(start + report_every)
+            if progress is not None:
+                progress(STAGE_PLACE, len(placement), n, len(tops))
+        self.placement = placement
+        self.run_count = runs.run_count
+        pile_count = len(tops)
+        counters.add('piles_created', pile_count)
+        started = time.perf_counter()
+
+        # Lay the piles out back to back in placement order
+        lengths = array(index_code, bytes(array(index_code).itemsize * pile_count))
+        for pile_idx in placement:
+            lengths[pile_idx] += 1
+        offsets = array(index_code, lengths)
+        total = 0
+        for pile_idx in range(pile_count):
+            offsets[pile_idx], total = total, total + lengths[pile_idx]
+        self.pile_lengths = lengths
+        self.pile_offsets = offsets
+
+        pile_values = copy_array(values)  # fresh buffer, overwritten in pile order
+        cursor = array(index_code, offsets)
+        for i, pile_idx in enumerate(placement):
+            pile_values[cursor[pile_idx]] = values[i]
+            cursor[pile_idx] += 1
+        self.pile_values = pile_values
+
+        # Merge pass: heap over pile tops, each entry (value, pile, flat position)
+        pops = array(index_code)
+        sorted_output = array('q') if isinstance(pile_values, array) else []
+        heap = [(pile_values[offsets[p] + lengths[p] - 1], p, offsets[p] + lengths[p] - 1)
+                for p in range(pile_count)]
+        heapq.heapify(heap)
+        while heap:
+            value, pile_idx, pos = heap[0]
+            if pos > offsets[pile_idx]:
+                heapq.heapreplace(heap, (pile_values[pos - 1], pile_idx, pos - 1))
+            else:
+                heapq.heappop(heap)
+            pops.append(pile_idx)
+            sorted_output.append(value)
+            if progress is not None and len(pops) % report_every == 0:
+                progress(STAGE_MERGE, len(pops), n, pile_count)
+        counters.add_time('merge', time.perf_counter() - started)
+        counters.add('merge_pops', len(pops))
+        if progress is not None:
+            progress(STAGE_MERGE, n, n, pile_count)
+        self.pops = pops
+        self.sorted_output = sorted_output
+
+        # Checkpoint memory is O(n * k / interval), so never checkpoint more
+        # often than every k events to keep it linear in n
+        self.checkpoint_interval = max(checkpoint_interval, pile_count, 1)
+        self.pile_checkpoints = []
+        self.merge_checkpoints = []
+        sizes = array(index_code)
+        for i, pile_idx in enumerate(placement):
+            if i % self.checkpoint_interval == 0:
+                self.pile_checkpoints.append(array(index_code, sizes))
+            if pile_idx == len(sizes):
+                sizes.append(1)
+            else:
+                sizes[pile_idx] += 1
+        taken = array(index_code, bytes(lengths.itemsize * pile_count))
+        for j, pile_idx in enumerate(pops):
+            if j % self.checkpoint_interval == 0:
+                self.merge_checkpoints.append(array(index_code, taken))
+            taken[pile_idx] += 1
+
+    def _record_numpy(self, values, index_code, checkpoint_interval, progress, report_every):
+        """Fill every field of the trace with the vectorized kernels"""
+        np = patience_numpy.np
+        n = len(values)
+        flat = np.frombuffer(values, dtype=np.int64) if isinstance(values, array) else np.asarray(values, np.int64)
+
+        def to_array(typecode, data):
+            return array(typecode, np.ascontiguousarray(data, dtype=typecode).tobytes())
+
+        counters = self.counters
+        runs = RunCounter(values)
+        scanning = 0.0
+
+        def report_place(done, piles):
+            # The runs are found along with the reported placement batches
+            nonlocal scanning
+            scan_started = time.perf_counter()
+            runs.scan(done)
+            scanning += time.perf_counter() - scan_started
+            if progress is not None:
+                progress(STAGE_PLACE, done, n, piles)
+
+        started = time.perf_counter()
+        placement, pile_count = patience_numpy.place_elements(flat, report_place, report_every)
+        pile_values, offsets, lengths = patience_numpy.pile_layout(flat, placement, pile_count)
+        counters.add_time('place', time.perf_counter() - started - scanning)
+        counters.add('piles_created', pile_count)
+        runs.scan(n)
+        self.run_count = runs.run_count
+        if progress is not None:
+            progress(STAGE_PLACE, n, n, pile_count)
+
+        started = time.perf_counter()
+        sorted_output, pops = patience_numpy.merge_piles(pile_values, offsets, lengths)
+        counters.add_time('merge', time.perf_counter() - started)
+        counters.add('merge_pops', len(pops))
+        if progress is not None:
+            progress(STAGE_MERGE, n, n, pile_count)
+
+        self.placement = to_array(index_code, placement)
+        self.pile_lengths = to_array(index_code, lengths)
+        self.pile_offsets = to_array(index_code, offsets)
+        self.pile_values = to_array('q', pile_values)
+        self.pops = to_array(index_code, pops)
+        self.sorted_output = to_array('q', sorted_output)
+
+        self.checkpoint_interval = max(checkpoint_interval, pile_count, 1)
+        self.pile_checkpoints = [to_array(index_code, row) for row in patience_numpy.checkpoints(
+            placement, pile_count, self.checkpoint_interval, grow=True)]
+        self.merge_checkpoints = [to_array(index_code, row) for row in patience_numpy.checkpoints(
+            pops, pile_count, self.checkpoint_interval, grow=False)]
+
+    @classmethod
+    def from_fields(cls, counters: Optional["PerfCounters"] = None, **fields) -> "SortTrace":
+        """Trace made of previously recorded FIELDS, without recording the run
+
+        counters are the recording's counters, if they were stored with it.
+        """
+        missing = set(cls.FIELDS) - set(fields)
+        if missing:
+            raise ValueError(f"missing trace fields: {', '.join(sorted(missing))}")
+        trace = cls.__new__(cls)
+        for name in cls.FIELDS:
+            setattr(trace, name, fields[name])
+        trace.counters = counters if counters is not None else PerfCounters()
+        return trace
+
+    @property
+    def pile_count(self) -> int:
+        return len(self.pile_lengths)
+
+    @property
+    def comparisons(self) -> int:
+        """Pile-top comparisons of the pile pass, counted into counters on first use"""
+        if 'comparisons' not in self.counters.counts:
+            self.counters.add('comparisons', bisect_comparisons(self.placement))
+        return self.counters['comparisons']
+
+    def pile_value(self, pile_idx: int, depth: int):
+        """Value at depth (0 = bottom) of a pile"""
+        return self.pile_values[self.pile_offsets[pile_idx] + depth]
+
+    def pile(self, pile_idx: int):
+        """Contents of a pile, bottom to top"""
+        offset = self.pile_offsets[pile_idx]
+        return self.pile_values[offset:offset + self.pile_lengths[pile_idx]]
+
+    def pile_sizes_at(self, placed: int) -> list:
+        """Return the pile sizes after the first placed elements were placed"""
+        interval = self.checkpoint_interval
+        if placed == len(self.placement):
+            return list(self.pile_lengths)
+        sizes = list(self.pile_checkpoints[placed // interval])
+        for pile_idx in self.placement[placed - placed % interval:placed]:
+            if pile_idx == len(sizes):
+                sizes.append(1)
+            else:
+                sizes[pile_idx] += 1
+        return sizes
+
+    def merge_taken_at(self, popped: int) -> list:
+        """Return how many elements were taken from each pile after popped pops"""
+        interval = self.checkpoint_interval
+        if popped == len(self.pops):
+            return list(self.pile_lengths)
+        taken = list(self.merge_checkpoints[popped // interval])
+        for pile_idx in self.pops[popped - popped % interval:popped]:
+            taken[pile_idx] += 1
+        return taken
+
+    def lis_indices(self) -> List[int]:
+        """Indices of a longest strictly increasing subsequence of the input
+
+        Recovered from the recorded placement without another pile pass:
+        when element i went onto pile p, the top of pile p - 1 was smaller,
+        and that top is the last element placed on pile p - 1 before i.
+        """
+        placement = self.placement
+        if not len(placement):
+            return []
+        pile = self.pile_count - 1
+        indices = []
+        for i in range(len(placement) - 1, -1, -1):
+            if placement[i] == pile:
+                indices.append(i)
+                pile -= 1
+                if pile < 0:
+                    break
+        indices.reverse()
+        return indices
+
+    def memory_usage(self) -> dict:
+        """Bytes used by each structure of the trace, plus their total"""
+        usage = {
+            'pile_values': buffer_size(self.pile_values),
+            'pile_index': buffer_size(self.pile_offsets) + buffer_size(self.pile_lengths),
+            'placement': buffer_size(self.placement),
+            'pops': buffer_size(self.pops),
+            'sorted_output': buffer_size(self.sorted_output),
+            'checkpoints': sum(buffer_size(c) for c in self.pile_checkpoints + self.merge_checkpoints),
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
+
+def fingerprint(values) -> str:
+    """Fast content hash of an input array, equal for equal inputs
+
+    Typed arrays are hashed straight from their buffer; lists of floats or
+    words through their repr, which tells 1 from 1.0 and '1'.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(values, (array, memoryview)):
+        digest.update((values.typecode if isinstance(values, array) else values.format).encode())
+        digest.update(memoryview(values).cast('B'))
+    else:
+        digest.update(repr(list(values)).encode())
+    return f"{len(values)}:{digest.hexdigest()}"
+
+
+class TraceCache:
+    """LRU cache of recorded runs keyed by the fingerprint of their input
+
+    A SortTrace holds the piles, the sorted output and every step of the
+    run, so a hit replays an input seen before without recording it again.
+    The cache is bounded by the total trace bytes (see
+    SortTrace.memory_usage); traces larger than max_bytes are not kept.
+    It is shared between the GUI thread and TraceWorker threads.
+    """
+
+    def __init__(self, max_bytes: int = 256 << 20):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, Tuple[SortTrace, int]]" = OrderedDict()
+        self.size = 0  # bytes of all cached traces
+        self.counters = PerfCounters()  # hits, misses, evictions
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[SortTrace]:
+        """Return the trace cached under key, or None, and count the hit or miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters.add('misses')
+                return None
+            self.entries.move_to_end(key)
+            self.counters.add('hits')
+            return entry[0]
+
+    def put(self, key: str, trace: SortTrace):
+        """Cache trace under key, evicting the least recently used traces to fit"""
+        size = trace.memory_usage()['total']
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            while self.size + size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= evicted
+                self.counters.add('evictions')
+            self.entries[key] = (trace, size)
+            self.size += size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counts and the current entries and bytes"""
+        with self.lock:
+            counts = self.counters
+            return {'hits': counts['hits'], 'misses': counts['misses'], 'evictions': counts['evictions'],
+                    'entries': len(self.entries), 'bytes': self.size}
+
+
+class PatienceSortEngine:
+    """Headless patience sort with a step iterator, seeking and event subscription
+
+    The engine owns all algorithm state. sort() runs the whole algorithm at
+    full speed; step() advances one visual phase at a time and reports what
+    happened to every subscriber, which is how the visualizer follows along.
+    The run is precomputed into a SortTrace on first use, so seek() can jump
+    to any step without replaying the run from the start; with a TraceCache
+    the recorded runs of inputs seen before are reused.
+
+    Step numbering for an input of n elements: steps 3i, 3i+1 and 3i+2
+    select, find the pile for and place element i; step 3n starts the
+    reconstruction, steps 3n+1 .. 3n+m take one element each and step
+    3n+m+1 finishes the run, where m is merge_count: n, or merge_limit
+    when only the smallest merge_limit elements are reconstructed.
+    """
+
+    def __init__(self, values=(), cache: Optional[TraceCache] = None):
+        self.listeners: List[Callable[[StepEvent], None]] = []
+        self.cache = cache
+        # Work done since the input was loaded: steps, pile-top comparisons,
+        # piles created, merge pops, seeks and the wall time of every event
+        # kind (including the time its subscribers took)
+        self.counters = PerfCounters()
+        self.merge_limit: Optional[int] = None
+        self.load(values)
+
+    def load(self, values):
+        """Replace the input array and reset the run"""
+        self.original_array = compact_array(values)
+        self._trace = None
+        self._lds = None
+        self.counters.reset()
+        self.reset()
+
+    @property
+    def trace(self) -> SortTrace:
+        """The precomputed trace of the run, built on first use"""
+        if self._trace is None:
+            if self.cache is None:
+                self._trace = SortTrace(self.original_array)
+            else:
+                key = fingerprint(self.original_array)
+                self._trace = self.cache.get(key)
+                if self._trace is None:
+                    self._trace = SortTrace(self.original_array)
+                    self.cache.put(key, self._trace)
+        return self._trace
+
+    @property
+    def has_trace(self) -> bool:
+        """Whether the run has been recorded already"""
+        return self._trace is not None
+
+    def set_trace(self, trace: SortTrace):
+        """Use a trace recorded elsewhere (e.g. by a TraceWorker) for this input"""
+        if len(trace.placement) != len(self.original_array):
+            raise ValueError("trace was recorded for a different input")
+        self._trace = trace
+        self.reset()
+
+    @property
+    def merge_count(self) -> int:
+        """Number of elements the reconstruction takes from the piles"""
+        n = len(self.original_array)
+        return n if self.merge_limit is None else min(self.merge_limit, n)
+
+    @property
+    def total_steps(self) -> int:
+        return 3 * len(self.original_array) + self.merge_count + 2
+
+    def set_merge_limit(self, limit: Optional[int]):
+        """Reconstruct only the limit smallest elements (None for all of them)
+
+        The elements already taken from the piles stay taken, as far as the
+        new limit allows.
+        """
+        n = len(self.original_array)
+        was_finished = self.is_finished
+        taken = self.sorted_count
+        self.merge_limit = None if limit is None else max(0, limit)
+        if self._trace is None:
+            return
+        position = self.position
+        if self.merge_started:
+            taken = min(taken, self.merge_count)
+            position = 3 * n + 1 + taken
+            if was_finished and taken == self.merge_count:
+                position = self.total_steps
+        self.seek(position)
+
+    def reset(self):
+        """Reset the run to its initial state, keeping the input"""
+        self.position = 0  # number of steps executed
+        self.pile_sizes = []
+        self.merge_taken = []  # elements already taken from each pile during reconstruction
+        self.sorted_count = 0
+        self.current_index = 0
+        self.current_element = self.original_array[0] if self.original_array else 0
+        self.target_pile = -1
+        self.current_phase = PHASE_IDLE
+        self.piles_complete = False
+        self.merge_started = False
+        self.is_finished = False
+
+    def pile_value(self, pile_idx: int, depth: int):
+        """Value at depth (0 = bottom) of a pile"""
+        return self.trace.pile_value(pile_idx, depth)
+
+    def sorted_value(self, i: int):
+        """Value at position i of the sorted output"""
+        return self.trace.sorted_output[i]
+
+    @property
+    def sorted_array(self) -> list:
+        """Copy of the part of the sorted output reconstructed so far"""
+        return list(self.trace.sorted_output[:self.sorted_count])
+
+    def subscribe(self, callback: Callable[[StepEvent], None]):
+        """Call callback(event) for every event emitted from now on"""
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[[StepEvent], None]):
+        """Stop sending events to callback"""
+        self.listeners.remove(callback)
+
+    def _emit(self, event: StepEvent) -> StepEvent:
+        for callback in self.listeners:
+            callback(event)
+        return event
+
+    def sort(self) -> list:
+        """Sort the whole input at full speed and return the sorted array
+
+        With a merge_limit only that many smallest elements are returned.
+        """
+        self.seek(self.total_steps - 1)
+        self.step()
+        return list(self.trace.sorted_output[:self.merge_count])
+
+    def steps(self) -> Iterator[StepEvent]:
+        """Iterate over the remaining steps, yielding every emitted event"""
+        while not self.is_finished:
+            yield from self.step()
+
+    def step(self) -> List[StepEvent]:
+        """Execute the next step and return the events it emitted"""
+        if self.is_finished:
+            return []
+        started = time.perf_counter()
+        events = self._advance()
+        counters = self.counters
+        counters.add('steps')
+        counters.add_time(events[0].kind, time.perf_counter() - started)
+        return events
+
+    def _advance(self) -> List[StepEvent]:
+        trace = self.trace
+        n = len(self.original_array)
+        position = self.position
+        self.position += 1
+
+        if position < 3 * n:
+            i, phase_step = divmod(position, 3)
+            if phase_step == 0:
+                self.current_index = i
+                self.current_element = self.original_array[i]
+                self.current_phase = PHASE_FIND_PILE
+                return [self._emit(StepEvent(EVENT_SELECT, i, self.current_element))]
+
+            if phase_step == 1:
+                self.target_pile = trace.placement[i]
+                self.current_phase = PHASE_PLACE
+                return [self._emit(StepEvent(EVENT_FIND, i, self.current_element,
+                                             self.target_pile, self.target_pile == len(self.pile_sizes)))]
+
+            event = StepEvent(EVENT_PLACE, i, self.current_element,
+                              self.target_pile, self.target_pile == len(self.pile_sizes))
+            if event.new_pile:
+                self.pile_sizes.append(1)
+                self.counters.add('piles_created')
+            else:
+                self.pile_sizes[self.target_pile] += 1
+            self.target_pile = -1
+            self.current_index += 1
+            if self.current_index < n:
+                self.current_phase = PHASE_HIGHLIGHT
+                return [self._emit(event)]
+            self.piles_complete = True
+            self.current_phase = PHASE_IDLE
+            return [self._emit(event), self._emit(StepEvent(EVENT_PILES_DONE))]
+
+        if position == 3 * n:
+            self.piles_complete = True
+            self.current_phase = PHASE_RECONSTRUCT
+            self.merge_taken = [0] * len(self.pile_sizes)
+            self.merge_started = True
+            return [self._emit(StepEvent(EVENT_MERGE_START))]
+
+        if position <= 3 * n + self.merge_count:
+            j = position - 3 * n - 1
+            pile_idx = trace.pops[j]
+            self.merge_taken[pile_idx] += 1
+            self.sorted_count = j + 1
+            self.counters.add('merge_pops')
+            return [self._emit(StepEvent(EVENT_POP, j, trace.sorted_output[j], pile_idx))]
+
+        self.current_phase = PHASE_IDLE
+        self.is_finished = True
+        return [self._emit(StepEvent(EVENT_DONE))]
+
+    def seek(self, position: int):
+        """Restore the state after the first position steps without emitting events"""
+        started = time.perf_counter()
+        try:
+            self._restore(max(0, min(position, self.total_steps)))
+        finally:
+            self.counters.add('seeks')
+            self.counters.add_time('seek', time.perf_counter() - started)
+
+    def _restore(self, position: int):
+        trace = self.trace
+        n = len(self.original_array)
+        self.reset()
+        self.position = position
+
+        if position <= 3 * n:
+            placed, phase_step = divmod(position, 3)
+            self.pile_sizes = trace.pile_sizes_at(placed)
+            self.current_index = placed
+            if placed == n:
+                self.current_element = self.original_array[-1] if n else 0
+                self.piles_complete = True
+                return
+            self.current_element = self.original_array[placed]
+            if phase_step == 1:
+                self.current_phase = PHASE_FIND_PILE
+            elif phase_step == 2:
+                self.current_phase = PHASE_PLACE
+                self.target_pile = trace.placement[placed]
+            elif position:
+                self.current_phase = PHASE_HIGHLIGHT
+                self.current_element = self.original_array[placed - 1]
+            return
+
+        popped = min(position - 3 * n - 1, self.merge_count)
+        self.pile_sizes = trace.pile_sizes_at(n)
+        self.current_index = n
+        self.current_element = self.original_array[-1] if n else 0
+        self.piles_complete = True
+        self.merge_started = True
+        self.merge_taken = trace.merge_taken_at(popped)
+        self.sorted_count = popped
+        if position == self.total_steps:
+            self.is_finished = True
+        else:
+            self.current_phase = PHASE_RECONSTRUCT
+
+    def longest_increasing_subsequence(self) -> List[int]:
+        """Indices of a longest strictly increasing subsequence, from the recorded run"""
+        return self.trace.lis_indices()
+
+    def longest_decreasing_subsequence(self) -> List[int]:
+        """Indices of a longest strictly decreasing subsequence of the input
+
+        Computed on first use (a full pass over the input, see LDSWorker to
+        run it in the background) and kept until another input is loaded.
+        """
+        if self._lds is None:
+            self._lds = longest_decreasing_subsequence(self.original_array)
+        return self._lds
+
+    @property
+    def has_lds(self) -> bool:
+        """Whether the longest decreasing subsequence is known already"""
+        return self._lds is not None
+
+    def set_lds(self, indices: List[int]):
+        """Use a longest decreasing subsequence computed elsewhere (e.g. by an LDSWorker)"""
+        self._lds = indices
+
+    def memory_usage(self) -> dict:
+        """Bytes used by the input and every trace structure of this run"""
+        usage = dict(self.trace.memory_usage())
+        usage['input'] = buffer_size(self.original_array)
+        usage['total'] += usage['input']
+        return usage
+
+    def step_back(self):
+        """Undo the last step"""
+        self.seek(self.position - 1)
+
+    def phase_start(self, phase: str) -> int:
+        """Return the step at which the given phase begins"""
+        if phase == PHASE_RECONSTRUCT:
+            return 3 * len(self.original_array)
+        return 0
+
+
+class WorkerEvent(NamedTuple):
+    """Progress record sent from a TraceWorker to the thread that owns it"""
+    stage: str
+    done: int = 0
+    total: int = 0
+    pile_count: int = 0
+    trace: Optional[SortTrace] = None
+    error: Optional[BaseException] = None
+    values: Optional[array] = None
+    cached: bool = False  # STAGE_DONE trace came from the TraceCache
+    lds: Optional[List[int]] = None  # STAGE_DONE result of an LDSWorker
+
+
+class TraceWorker(threading.Thread):
+    """Records a SortTrace in a background thread
+
+    Progress is pushed into the bounded queue self.events, so a slow
+    consumer throttles the worker instead of letting the queue grow. The
+    last event is always STAGE_DONE (with the trace), STAGE_CANCELLED or
+    STAGE_ERROR.
+
+    When loader is given, values is ignored and loader(progress) is called
+    first to read the input; the loaded array is posted as STAGE_LOADED
+    before recording starts. With a cache, an input recorded before is
+    not recorded again, and new recordings are added to the cache.
+    """
+
+    def __init__(self, values, queue_size: int = 64, report_every: int = 65536,
+                 loader: Optional[Callable[[Callable], array]] = None,
+                 cache: Optional[TraceCache] = None):
+        super().__init__(daemon=True)
+        self.values = values
+        self.loader = loader
+        self.cache = cache
+        self.report_every = report_every
+        self.events: "queue.Queue[WorkerEvent]" = queue.Queue(maxsize=queue_size)
+        self.cancelled = threading.Event()
+        self.resumed = threading.Event()  # cleared while paused
+        self.resumed.set()
+
+    def run(self):
+        try:
+            if self.loader is not None:
+                self.values = self.loader(self._report)
+                self._put(WorkerEvent(STAGE_LOADED, len(self.values), len(self.values), values=self.values))
+            key = trace = None
+            if self.cache is not None:
+                key = fingerprint(self.values)
+                trace = self.cache.get(key)
+            cached = trace is not None
+            if not cached:
+                trace = SortTrace(self.values, progress=self._report, report_every=self.report_every)
+                if key is not None:
+                    self.cache.put(key, trace)
+        except SortCancelled:
+            self._put(WorkerEvent(STAGE_CANCELLED), force=True)
+        except Exception as error:
+            self._put(WorkerEvent(STAGE_ERROR, error=error), force=True)
+        else:
+            self._put(WorkerEvent(STAGE_DONE, len(self.values), len(self.values),
+                                  trace.pile_count, trace, cached=cached), force=True)
+
+    def _report(self, stage, done, total, pile_count):
+        while not self.resumed.wait(0.1):
+            if self.cancelled.is_set():
+                raise SortCancelled()
+        if self.cancelled.is_set():
+            raise SortCancelled()
+        self._put(WorkerEvent(stage, done, total, pile_count))
+
+    def _put(self, event: WorkerEvent, force: bool = False):
+        while True:
+            if self.cancelled.is_set() and not force:
+                raise SortCancelled()
+            try:
+                self.events.put(event, timeout=0.1)
+                return
+            except queue.Full:
+                if force and self.cancelled.is_set():
+                    return  # nobody is listening any more
+
+    def pause(self):
+        self.resumed.clear()
+
+    def resume(self):
+        self.resumed.set()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.resumed.set()
+
+
+class LDSWorker(TraceWorker):
+    """Finds a longest decreasing subsequence of values in a background thread
+
+    Only started when the subsequence is asked for, never as part of a
+    recording. Progress is posted as STAGE_LDS, the last event is
+    STAGE_DONE (with lds), STAGE_CANCELLED or STAGE_ERROR, and pause(),
+    resume() and cancel() work as for a TraceWorker.
+    """
+
+    def run(self):
+        n = len(self.values)
+        try:
+            lds = longest_decreasing_subsequence(
+                self.values, lambda done: self._report(STAGE_LDS, done, n, 0), self.report_every)
+        except SortCancelled:
+            self._put(WorkerEvent(STAGE_CANCELLED), force=True)
+        except Exception as error:
+            self._put(WorkerEvent(STAGE_ERROR, error=error), force=True)
+        else:
+            self._put(WorkerEvent(STAGE_DONE, n, n, lds=lds), force=True)
+
+
+def patience_sort(values, key: Optional[Callable] = None, reverse: bool = False,
+                  min_run: int = MIN_RUN) -> list:
+    """Return a stably sorted copy of values using patience sort
+
+    Works like sorted(): key is called once per element (decorate, sort,
+    undecorate) and items with equal keys keep their input order, also with
+    reverse=True. Monotone runs of at least min_run elements are used as
+    ready-made piles; min_run=0 runs the plain pile pass over every element.
+    """
+    items = list(values)
+    if reverse:
+        items.reverse()  # sorting the reversed input keeps equal keys in order once reversed back
+    keys = items if key is None else [key(item) for item in items]
+    result = [items[i] for i in stable_order(keys, min_run)]
+    if reverse:
+        result.reverse()
+    return result
+
+
+class OnlinePatienceSorter:
+    """Patience piles built one value at a time, usable as a priority queue
+
+    push() places a value on the leftmost pile whose top is >= value, as in
+    the batch pile pass, so the pile tops stay sorted and the smallest
+    value is always the top of the first pile. pop_min() takes it and moves
+    that pile to the position of its new top, so the smallest values can be
+    pulled while the stream is still being pushed.
+
+    push() costs O(log piles), but pop_min() is O(piles) because moving the
+    first pile shifts the piles before its new position in a list. That
+    shift is a memmove and cheap while there are few piles (nearly sorted
+    streams); on random input (about 2 sqrt(n) piles) use heapq when pops
+    dominate.
+    """
+
+    def __init__(self, values=()):
+        self.pile_set = PileSet()
+        self.size = 0
+        self.version = 0  # changed by every push and pop, checked by iter_sorted()
+        self.extend(values)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def pile_count(self) -> int:
+        return len(self.pile_set)
+
+    def push(self, value) -> int:
+        """Add value and return the index of the pile it was placed on"""
+        self.size += 1
+        self.version += 1
+        return self.pile_set.place(value)
+
+    def extend(self, values):
+        """Push every value of an iterable
+
+        The values placed before the iterable raises are kept and counted.
+        """
+        place = self.pile_set.place
+        count = self.size
+        try:
+            for value in values:
+                place(value)
+                count += 1
+        finally:
+            self.version += count - self.size
+            self.size = count
+
+    def peek_min(self):
+        """Return the smallest value without removing it"""
+        if not self.size:
+            raise IndexError("peek at an empty sorter")
+        return self.pile_set.tops[0]
+
+    def pop_min(self):
+        """Remove and return the smallest value, in O(piles) (see the class docstring)"""
+        if not self.size:
+            raise IndexError("pop from an empty sorter")
+        piles = self.pile_set.piles
+        tops = self.pile_set.tops
+        pile = piles[0]
+        value = pile.pop()
+        self.size -= 1
+        self.version += 1
+        if not pile:
+            del piles[0]
+            del tops[0]
+            return value
+        # The new top is >= the old one: shift the piles it now passes one to
+        # the left, so the tops stay sorted for the next push
+        top = pile[-1]
+        target = bisect.bisect_left(tops, top, 1) - 1
+        if target:
+            piles[:target] = piles[1:target + 1]
+            tops[:target] = tops[1:target + 1]
+            piles[target] = pile
+        tops[target] = top
+        return value
+
+    def iter_sorted(self) -> Iterator:
+        """Lazily yield the values in ascending order without removing them
+
+        Every value is produced by one heap step over the pile tops, so
+        taking the first k values costs O(piles + k log piles). The sorter
+        must not be changed while the iterator is in use.
+        """
+        return self._iter_sorted(self.version)
+
+    def _iter_sorted(self, version: int) -> Iterator:
+        merge = self.pile_set.iter_merge()
+        while True:
+            # Check before resuming the merge, which reads the piles right away
+            if self.version != version:
+                raise RuntimeError("sorter changed during iteration")
+            try:
+                _, value = next(merge)
+            except StopIteration:
+                return
+            yield value
+
+    def __iter__(self):
+        return self.iter_sorted()
@@ -0,0 +1,193 @@
+"""External-memory patience sort for inputs larger than RAM.
+
+The input is streamed in runs of run_length values. Each run is sorted in
+memory with the same pile pass and heap merge as the visualizer and
+spilled to a temporary file of raw int64 values. The run files are then
+merged with a heap over buffered readers, at most fan_in runs at a time,
+so memory stays bounded by one run plus fan_in read buffers:
+
+    python patience_external.py logs.txt sorted.bin
+    python patience_external.py data.bin sorted.txt --run-length 4000000 --tmp-dir /scratch
+"""
+import argparse
+import heapq
+import os
+import sys
+import tempfile
+import time
+from array import array
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional
+
+from patience_engine import MIN_RUN, STAGE_MERGE, STAGE_PLACE, build_piles, format_bytes, merge_piles
+from patience_io import CHUNK_SIZE, iter_chunks
+
+RUN_LENGTH = 1 << 20  # values sorted in memory per run file
+FAN_IN = 64  # run files merged at once
+BUFFER_VALUES = 1 << 16  # values read or written per block
+TEXT_EXTENSIONS = ('.txt', '.csv')
+
+ProgressCallback = Callable[[str, int, int, int], None]
+
+
+class ExternalSortStats(NamedTuple):
+    """Summary of one external sort"""
+    values: int
+    runs: int
+    max_piles: int  # most piles built for a single run
+    merge_passes: int
+
+
+def iter_runs(chunks: Iterable[array], run_length: int) -> Iterator[array]:
+    """Regroup a stream of int64 arrays into arrays of run_length values"""
+    pending = array('q')
+    for chunk in chunks:
+        pending.extend(chunk)
+        while len(pending) >= run_length:
+            yield pending[:run_length]
+            del pending[:run_length]
+    if pending:
+        yield pending
+
+
+def write_run(path: str, values: Iterable[int], buffer_values: int = BUFFER_VALUES):
+    """Write values to path as native int64, one buffered block at a time"""
+    with open(path, 'wb') as file:
+        block = array('q')
+        for value in values:
+            block.append(value)
+            if len(block) >= buffer_values:
+                block.tofile(file)
+                del block[:]
+        block.tofile(file)
+
+
+def read_run(path: str, buffer_values: int = BUFFER_VALUES) -> Iterator[int]:
+    """Stream the int64 values of a run file, one buffered block at a time"""
+    with open(path, 'rb') as file:
+        while True:
+            block = array('q')
+            try:
+                block.fromfile(file, buffer_values)
+            except EOFError:
+                pass  # the partial last block is still read
+            if not block:
+                return
+            yield from block
+
+
+def write_output(path: str, values: Iterable[int], buffer_values: int = BUFFER_VALUES):
+    """Write the sorted values as text lines or as raw little-endian int64"""
+    if os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS:
+        with open(path, 'w') as file:
+            block = []
+            for value in values:
+                block.append(value)
+                if len(block) >= buffer_values:
+                    file.write('\n'.join(map(str, block)) + '\n')
+                    block.clear()
+            if block:
+                file.write('\n'.join(map(str, block)) + '\n')
+        return
+
+    with open(path, 'wb') as file:
+        block = array('q')
+        for value in values:
+            block.append(value)
+            if len(block) >= buffer_values:
+                if sys.byteorder == 'big':
+                    block.byteswap()
+                block.tofile(file)
+                del block[:]
+        if sys.byteorder == 'big':
+            block.byteswap()
+        block.tofile(file)
+
+
+def external_sort(input_path: str, output_path: str, run_length: int = RUN_LENGTH,
+                  fan_in: int = FAN_IN, buffer_values: int = BUFFER_VALUES,
+                  tmp_dir: Optional[str] = None,
+                  progress: Optional[ProgressCallback] = None) -> ExternalSortStats:
+    """Sort the integers of input_path into output_path with bounded memory
+
+    The input may be any format read by patience_io (text, .npy or raw
+    int64). progress(stage, done, total, count) is called with STAGE_PLACE
+    after every spilled run (count is the number of runs so far) and with
+    STAGE_MERGE after every merged block.
+    """
+    if fan_in < 2:
+        raise ValueError("fan_in must be at least 2")
+
+    with tempfile.TemporaryDirectory(prefix="patience-", dir=tmp_dir) as work_dir:
+        run_paths: List[str] = []
+        total = 0
+        max_piles = 0
+        for run in iter_runs(iter_chunks(input_path, chunk_size=CHUNK_SIZE), run_length):
+            piles = build_piles(run, MIN_RUN)
+            max_piles = max(max_piles, len(piles))
+            path = os.path.join(work_dir, f"run-{len(run_paths):06d}.bin")
+            write_run(path, merge_piles(piles), buffer_values)
+            run_paths.append(path)
+            total += len(run)
+            if progress is not None:
+                progress(STAGE_PLACE, total, 0, len(run_paths))
+        runs = len(run_paths)
+
+        # Merge groups of fan_in runs until one final merge remains
+        passes = 0
+        while len(run_paths) > fan_in:
+            passes += 1
+            merged_paths = []
+            for start in range(0, len(run_paths), fan_in):
+                group = run_paths[start:start + fan_in]
+                path = os.path.join(work_dir, f"pass-{passes}-{len(merged_paths):06d}.bin")
+                write_run(path, heapq.merge(*(read_run(p, buffer_values) for p in group)), buffer_values)
+                for p in group:
+                    os.remove(p)
+                merged_paths.append(path)
+            run_paths = merged_paths
+
+        merged = heapq.merge(*(read_run(p, buffer_values) for p in run_paths))
+        if progress is not None:
+            merged = _report_merge(merged, total, len(run_paths), buffer_values, progress)
+        write_output(output_path, merged, buffer_values)
+
+    return ExternalSortStats(total, runs, max_piles, passes + 1 if runs else 0)
+
+
+def _report_merge(values, total, run_count, every, progress):
+    done = 0
+    for value in values:
+        yield value
+        done += 1
+        if done % every == 0:
+            progress(STAGE_MERGE, done, total, run_count)
+    progress(STAGE_MERGE, done, total, run_count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="External-memory patience sort of an integer file")
+    parser.add_argument("input", help="text (.csv/.txt/other), .npy or raw int64 (.bin/.raw/.i64/.int64) file")
+    parser.add_argument("output", help="sorted output: text lines for .txt/.csv, raw little-endian int64 otherwise")
+    parser.add_argument("--run-length", type=int, default=RUN_LENGTH, help="values sorted in memory per run")
+    parser.add_argument("--fan-in", type=int, default=FAN_IN, help="run files merged at once")
+    parser.add_argument("--buffer", type=int, default=BUFFER_VALUES, help="values per read/write block")
+    parser.add_argument("--tmp-dir", default=None, help="directory for the temporary run files")
+    args = parser.parse_args()
+
+    def report(stage, done, total, count):
+        if stage == STAGE_PLACE:
+            print(f"\rspilled {count:,} runs ({done:,} values)", end="", file=sys.stderr)
+        else:
+            print(f"\rmerged {done:,}/{total:,} values from {count:,} runs", end="", file=sys.stderr)
+
+    start = time.perf_counter()
+    stats = external_sort(args.input, args.output, args.run_length, args.fan_in, args.buffer,
+                          args.tmp_dir, progress=report)
+    print(file=sys.stderr)
+    print(f"sorted {stats.values:,} values in {time.perf_counter() - start:.2f}s: "
+          f"{stats.runs:,} runs (at most {stats.max_piles:,} piles each), "
+          f"{stats.merge_passes} merge passes, output {format_bytes(os.path.getsize(args.output))}")
+
+
+if __name__ == "__main__":
+    main()
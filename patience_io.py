@@ -0,0 +1,208 @@
+"""Bulk input loading for the Patience Sort visualizer.
+
+Inputs of millions of values are read straight into a flat int64 array
+instead of going through the single line Entry widget:
+
+- text files (comma, semicolon or whitespace separated) are parsed in
+  chunks, with NumPy when it is installed and with int() per token if not
+- .npy files are memory mapped and copied over in chunks
+- raw files (.bin, .raw, .i64, .int64) are little endian int64 values
+  read directly into the array buffer
+
+Validation (minimum length, positive values) is done in bulk once the
+array is complete.
+"""
+import math
+import os
+import re
+import sys
+import warnings
+from array import array
+from typing import Callable, Iterator, Optional
+
+from patience_engine import STAGE_LOAD
+import patience_numpy  # NumPy is optional and imported on first use
+
+MIN_LENGTH = 10
+CHUNK_SIZE = 1 << 24  # bytes read (or values copied) per progress report
+NUMPY_MIN_BYTES = 1 << 16  # shorter text is parsed faster by int() than by importing NumPy
+RAW_EXTENSIONS = ('.bin', '.raw', '.i64', '.int64')
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+# Every separator becomes a single space so a chunk can be cut at its last space
+SEPARATORS = bytes.maketrans(b',;\t\r\n\f\v', b'       ')
+# A + or - on its own, which fromstring would join to the next number (or read as 0)
+LONE_SIGN = re.compile(rb'(?<![^ ])[+-](?![^ ])')
+
+ProgressCallback = Callable[[str, int, int, int], None]
+
+
+def parse_text(text) -> array:
+    """Parse comma, semicolon or whitespace separated integers into an int64 array"""
+    if isinstance(text, str):
+        text = text.encode('ascii', 'replace')
+    values = array('q')
+    _parse_chunk(text.translate(SEPARATORS), values)
+    return values
+
+
+def _parse_chunk(chunk: bytes, values: array):
+    """Append the integers in a chunk whose separators are all spaces"""
+    if not chunk.strip():
+        return
+    np = patience_numpy.np if len(chunk) >= NUMPY_MIN_BYTES else None
+    if np is not None and not LONE_SIGN.search(chunk):
+        with warnings.catch_warnings():
+            # fromstring only warns when it stops at a token that is not an integer
+            warnings.simplefilter('error', DeprecationWarning)
+            try:
+                parsed = np.fromstring(chunk, dtype=np.int64, sep=' ')
+            except (ValueError, DeprecationWarning):
+                parsed = None
+        # Out of range tokens saturate instead of failing, let int() report them
+        if parsed is not None and not ((parsed == INT64_MAX).any() or (parsed == INT64_MIN).any()):
+            values.frombytes(parsed.tobytes())
+            return
+    try:
+        values.extend(map(int, chunk.split()))
+    except (ValueError, OverflowError):
+        raise ValueError("Invalid input! Values must be 64-bit integers separated "
+                         "by commas or whitespace.") from None
+
+
+def parse_items(text: str) -> list:
+    """Parse items that are not all integers, separated as for parse_text
+
+    Returns numbers (ints stay ints, the rest become floats) when every item
+    is a finite number, and the items as strings when most of them are
+    words, so the result is always mutually comparable. Mostly numbers
+    with a few words in between is taken for a typo and raises ValueError.
+    """
+    # A str indexed by ordinal is a translation table for str too
+    tokens = text.translate(SEPARATORS.decode('latin-1')).split()
+    numbers = [_parse_number(token) for token in tokens]
+    words = [token for token, number in zip(tokens, numbers) if number is None]
+    if tokens and len(words) * 2 >= len(tokens):
+        return tokens
+    if words:
+        raise ValueError(f"Invalid input! {words[0]!r} is not a number "
+                         f"(the other {len(tokens) - len(words):,} items are).")
+    if not all(math.isfinite(number) for number in numbers):
+        raise ValueError("Invalid input! Numbers must be finite (no nan or inf).")
+    return numbers
+
+
+def _parse_number(token: str):
+    """token as an int or float, or None if it is not a number"""
+    try:
+        return int(token) if token.lstrip('+-').isdigit() else float(token)
+    except ValueError:
+        return None
+
+
+def check_values(values, positive: bool = True):
+    """Raise ValueError unless values is long enough and, if positive is set, strictly positive
+
+    The positivity rule applies to numbers of any kind; words (see
+    parse_items) have no sign and are only checked for their count.
+    """
+    if len(values) < MIN_LENGTH:
+        raise ValueError(f"Array must have at least {MIN_LENGTH} elements! "
+                         f"You entered {len(values)} elements.")
+    if not positive or isinstance(values[0], str):
+        return
+    np = patience_numpy.np if isinstance(values, array) and len(values) >= patience_numpy.MIN_SIZE else None
+    if np is not None:
+        smallest = int(np.frombuffer(values, dtype=np.int64).min())
+    else:
+        smallest = min(values)
+    if smallest <= 0:
+        raise ValueError("All elements must be positive numbers!")
+
+
+def read_values(path: str, progress: Optional[ProgressCallback] = None,
+                chunk_size: int = CHUNK_SIZE) -> array:
+    """Load and validate the integers stored in path
+
+    progress(STAGE_LOAD, done, total, 0) is called after every chunk, with
+    done and total counted in bytes for text files and in values otherwise.
+    """
+    values = array('q')
+    for chunk in iter_chunks(path, progress, chunk_size):
+        values.extend(chunk)
+    check_values(values)
+    return values
+
+
+def iter_chunks(path: str, progress: Optional[ProgressCallback] = None,
+                chunk_size: int = CHUNK_SIZE) -> Iterator[array]:
+    """Stream the integers stored in path as int64 arrays of about chunk_size bytes"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy':
+        return _iter_npy(path, progress, chunk_size)
+    if extension in RAW_EXTENSIONS:
+        return _iter_raw(path, progress, chunk_size)
+    return _iter_text(path, progress, chunk_size)
+
+
+def _iter_text(path, progress, chunk_size):
+    total = os.path.getsize(path)
+    done = 0
+    tail = b''
+    with open(path, 'rb') as file:
+        while True:
+            block = file.read(chunk_size)
+            if not block:
+                break
+            done += len(block)
+            chunk = tail + block.translate(SEPARATORS)
+            cut = chunk.rfind(b' ') + 1  # a token may continue in the next block
+            tail = chunk[cut:]
+            values = array('q')
+            _parse_chunk(chunk[:cut], values)
+            if progress is not None:
+                progress(STAGE_LOAD, done, total, 0)
+            yield values
+    values = array('q')
+    _parse_chunk(tail, values)
+    yield values
+
+
+def _iter_raw(path, progress, chunk_size):
+    size = os.path.getsize(path)
+    if size % 8:
+        raise ValueError(f"Raw int64 file size must be a multiple of 8 bytes, got {size:,}.")
+    total = size // 8
+    step = max(1, chunk_size // 8)
+    done = 0
+    with open(path, 'rb') as file:
+        while done < total:
+            values = array('q')
+            values.fromfile(file, min(step, total - done))
+            if sys.byteorder == 'big':
+                values.byteswap()
+            done += len(values)
+            if progress is not None:
+                progress(STAGE_LOAD, done, total, 0)
+            yield values
+
+
+def _iter_npy(path, progress, chunk_size):
+    np = patience_numpy.np
+    if np is None:
+        raise ValueError("Reading .npy files requires NumPy.")
+    data = np.load(path, mmap_mode='r', allow_pickle=False)
+    if data.dtype.kind not in 'iu':
+        raise ValueError(f"Expected an integer .npy array, got dtype {data.dtype}.")
+    data = data.reshape(-1)
+    total = len(data)
+    step = max(1, chunk_size // 8)
+    for start in range(0, total, step):
+        block = data[start:start + step]
+        if data.dtype.kind == 'u' and len(block) and block.max() > INT64_MAX:
+            raise ValueError("Values must fit in a 64-bit signed integer.")
+        values = array('q', block.astype(np.int64).tobytes())
+        if progress is not None:
+            progress(STAGE_LOAD, min(start + step, total), total, 0)
+        yield values
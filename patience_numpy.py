@@ -0,0 +1,200 @@
+"""NumPy kernels for the patience sort pile pass and merge.
+
+Used by SortTrace for int64 inputs when NumPy is installed; without NumPy
+every function here is unavailable and the pure Python paths are used.
+NumPy is only imported when it is first needed: reading the module
+attribute np (None without NumPy) or calling a kernel imports it, so
+importing the engine stays cheap.
+
+- placement: elements are placed in batches. Every batch is located with
+  one np.searchsorted over the preallocated tops array, and the longest
+  prefix whose speculative piles cannot interfere is committed at once
+  (see place_elements). Presorted stretches commit whole batches.
+- layout: the piles are laid out back to back by a stable argsort of the
+  placement, in one preallocated buffer.
+- merge: the piles, read top to bottom, are ascending runs. Laid out
+  back to back they are merged by NumPy's stable sort, a timsort that
+  detects and merges exactly these runs, in the (value, pile) order of
+  the heap merge.
+"""
+from typing import Callable, Optional
+
+MIN_SIZE = 1 << 12  # smaller inputs are faster in pure Python
+MIN_BATCH = 16
+MAX_BATCH = 4096
+
+_numpy = False  # not imported yet; None once the import failed
+
+
+def load_numpy():
+    """Import NumPy on first use and return it, or None if it is not installed"""
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:  # NumPy is optional, SortTrace falls back to pure Python
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+
+def __getattr__(name):
+    if name == 'np':
+        return load_numpy()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def place_elements(values, progress: Optional[Callable[[int, int], None]] = None,
+                   report_every: int = 65536):
+    """Return (placement, pile_count) for the int64 ndarray values
+
+    placement[i] is the leftmost pile whose top is >= values[i] when it is
+    placed, exactly as in the sequential pile pass. A batch of speculative
+    positions pos (computed against the tops before the batch) stays valid
+    up to the first element that another element of the batch could have
+    redirected: an element on an existing pile p is still placed on p as
+    long as it is <= the batch element placed on p before it, and an
+    element beyond the last pile still starts a new pile as long as it is
+    greater than the new pile started before it.
+
+    progress(done, pile_count) is called about every report_every elements.
+    """
+    np = load_numpy()
+    n = len(values)
+    tops = np.empty(n, dtype=values.dtype)
+    placement = np.empty(n, dtype=np.int64)
+    pile_count = 0
+    batch = MIN_BATCH
+    next_report = report_every
+    i = 0
+    while i < n:
+        chunk = values[i:i + batch]
+        pos = np.searchsorted(tops[:pile_count], chunk, side='left')
+
+        # Compare every element with the previous batch element on the same position
+        order = np.argsort(pos, kind='stable')
+        grouped_pos = pos[order]
+        grouped = chunk[order]
+        same = grouped_pos[1:] == grouped_pos[:-1]
+        new_pile = grouped_pos[1:] == pile_count
+        valid = ~same | np.where(new_pile, grouped[1:] > grouped[:-1], grouped[1:] <= grouped[:-1])
+        invalid = order[1:][~valid]
+        accepted = int(invalid.min()) if len(invalid) else len(chunk)
+
+        pos = pos[:accepted]
+        chunk = chunk[:accepted]
+        appended = pos == pile_count
+        existing = ~appended
+        tops[pos[existing]] = chunk[existing]  # the last element placed on a pile wins
+        new_count = int(np.count_nonzero(appended))
+        pos[appended] = np.arange(pile_count, pile_count + new_count)
+        tops[pile_count:pile_count + new_count] = chunk[appended]
+        pile_count += new_count
+        placement[i:i + accepted] = pos
+        i += accepted
+
+        # Grow the batch while whole batches commit, shrink it on early conflicts
+        if accepted == batch:
+            batch = min(batch * 2, MAX_BATCH)
+        else:
+            batch = max(MIN_BATCH, accepted * 2)
+        if progress is not None and i >= next_report:
+            progress(i, pile_count)
+            next_report = i + report_every
+    return placement, pile_count
+
+
+def bisect_comparisons(placement, pile_count: int = 0) -> int:
+    """Comparisons bisect_left makes in the sequential pile pass behind placement
+
+    pile_count is the number of piles before placement[0]. Every element
+    is searched among the piles that exist when it is placed, one more
+    than the largest pile index before it. The binary searches of all
+    elements run side by side, one halving step per round.
+    """
+    np = load_numpy()
+    target = np.asarray(placement, dtype=np.int64)
+    hi = np.empty(len(target), dtype=np.int64)
+    if len(target):
+        hi[0] = pile_count
+        np.maximum(np.maximum.accumulate(target[:-1]) + 1, pile_count, out=hi[1:])
+    lo = np.zeros_like(hi)
+    total = 0
+    while len(lo):
+        active = lo < hi
+        lo, hi, target = lo[active], hi[active], target[active]
+        total += len(lo)
+        mid = (lo + hi) >> 1
+        right = mid < target
+        lo = np.where(right, mid + 1, lo)
+        hi = np.where(right, hi, mid)
+    return total
+
+
+def pile_layout(values, placement, pile_count: int):
+    """Lay the piles out back to back, each bottom to top
+
+    Returns (pile_values, offsets, lengths) as ndarrays.
+    """
+    np = load_numpy()
+    lengths = np.bincount(placement, minlength=pile_count)
+    offsets = np.zeros(pile_count, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    pile_values = values[np.argsort(placement, kind='stable')]
+    return pile_values, offsets, lengths
+
+
+def merge_piles(pile_values, offsets, lengths):
+    """Merge the piles into (sorted_output, pops)
+
+    pops[j] is the pile the j-th output value comes from. Ties go to the
+    lower pile and, within a pile, to the element nearer the top, which is
+    the order of the heap merge over (value, pile, position).
+    """
+    np = load_numpy()
+    pile_of = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+    # Flat position of every element with each pile read top to bottom
+    ends = np.repeat(offsets + lengths - 1, lengths)
+    reversed_positions = ends - (np.arange(len(pile_values)) - np.repeat(offsets, lengths))
+    runs = pile_values[reversed_positions]
+    order = np.argsort(runs, kind='stable')
+    return runs[order], pile_of[order]
+
+
+def checkpoints(events, pile_count: int, interval: int, grow: bool):
+    """Per-pile event counts before every multiple of interval events
+
+    Row c counts the events events[:c * interval] per pile. With grow the
+    row is cut to the piles that exist at that point, which for placements
+    is one more than the largest pile index seen so far.
+    """
+    np = load_numpy()
+    n = len(events)
+    rows = (n + interval - 1) // interval
+    if rows == 0:
+        return []
+    blocks = np.arange(n, dtype=np.int64) // interval
+    counts = np.bincount(blocks * pile_count + events, minlength=rows * pile_count)
+    counts = counts.reshape(rows, pile_count)
+    before = np.zeros_like(counts)
+    np.cumsum(counts[:-1], axis=0, out=before[1:])
+    if not grow:
+        return list(before)
+    seen = np.maximum.accumulate(events)[interval - 1::interval][:rows - 1] + 1
+    widths = [0] + seen.tolist()
+    return [row[:width] for row, width in zip(before, widths)]
+
+
+def patience_sort(values):
+    """Return the sorted ndarray of values using the vectorized kernels
+
+    Without NumPy this is patience_engine.patience_sort, returning a list.
+    """
+    np = load_numpy()
+    if np is None:
+        from patience_engine import patience_sort as python_patience_sort
+        return python_patience_sort(values)
+    values = np.asarray(values)
+    placement, pile_count = place_elements(values)
+    sorted_output, _ = merge_piles(*pile_layout(values, placement, pile_count))
+    return sorted_output
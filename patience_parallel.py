@@ -0,0 +1,167 @@
+"""Multi-core patience sort.
+
+The input is copied once into a shared memory block of int64 values.
+Worker processes sort contiguous chunks of it in place with the pile pass
+and heap merge of patience_engine, then merge the sorted chunks in
+parallel: splitter values sampled from the chunks cut every chunk into
+value ranges, and each worker heap-merges one range straight into its
+slot of a second shared block. Only block names and offsets cross the
+process boundary, never the values themselves.
+
+Run as a script to benchmark the speedup against the worker count:
+
+    python patience_parallel.py --size 10000000 --workers 1 2 4 8
+"""
+import argparse
+import bisect
+import heapq
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from patience_engine import MIN_RUN, build_piles, merge_piles
+
+MIN_CHUNK = 1 << 16  # smaller chunks are not worth a process round trip
+SAMPLES_PER_CHUNK = 64  # splitter candidates taken from every sorted chunk
+
+
+class ParallelSortStats(NamedTuple):
+    """Summary of one parallel sort"""
+    workers: int
+    chunks: int
+    max_piles: int  # most piles built for a single chunk
+
+
+def _sort_chunk(name: str, start: int, stop: int) -> int:
+    """Sort values[start:stop] of shared block name in place, return its pile count"""
+    block = shared_memory.SharedMemory(name=name)
+    view = block.buf.cast('q')
+    try:
+        piles = build_piles(view[start:stop].tolist(), MIN_RUN)
+        view[start:stop] = array('q', merge_piles(piles))
+        return len(piles)
+    finally:
+        view.release()
+        block.close()
+
+
+def _merge_range(source: str, target: str, bounds: Sequence[Tuple[int, int]], offset: int):
+    """Heap-merge the sorted slices bounds of source into target from offset"""
+    source_block = shared_memory.SharedMemory(name=source)
+    target_block = shared_memory.SharedMemory(name=target)
+    source_view = source_block.buf.cast('q')
+    target_view = target_block.buf.cast('q')
+    try:
+        merged = array('q', heapq.merge(*(source_view[lo:hi] for lo, hi in bounds)))
+        target_view[offset:offset + len(merged)] = merged
+    finally:
+        source_view.release()
+        target_view.release()
+        source_block.close()
+        target_block.close()
+
+
+def chunk_bounds(size: int, chunks: int) -> List[Tuple[int, int]]:
+    """Split range(size) into chunks contiguous (start, stop) pairs of near equal length"""
+    edges = [size * i // chunks for i in range(chunks + 1)]
+    return list(zip(edges, edges[1:]))
+
+
+def pick_splitters(view, chunks: Sequence[Tuple[int, int]], parts: int) -> list:
+    """parts - 1 values that cut the sorted chunks into ranges of similar size"""
+    samples = []
+    for start, stop in chunks:
+        step = max(1, (stop - start) // SAMPLES_PER_CHUNK)
+        samples.extend(view[start:stop:step].tolist())
+    samples.sort()
+    return [samples[len(samples) * i // parts] for i in range(1, parts)]
+
+
+def parallel_sort(values, workers: Optional[int] = None,
+                  executor: Optional[ProcessPoolExecutor] = None) -> Tuple[array, ParallelSortStats]:
+    """Return values sorted as an int64 array, using up to workers processes
+
+    An existing executor may be passed to avoid paying the process start up
+    on every call; its worker count is then given by workers.
+    """
+    workers = workers or os.cpu_count() or 1
+    size = len(values)
+    chunk_count = max(1, min(workers, size // MIN_CHUNK))
+    if chunk_count == 1:
+        piles = build_piles(values, MIN_RUN)
+        return array('q', merge_piles(piles)), ParallelSortStats(1, 1, len(piles))
+
+    nbytes = size * 8
+    source = shared_memory.SharedMemory(create=True, size=nbytes)
+    target = shared_memory.SharedMemory(create=True, size=nbytes)
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=chunk_count)
+    view = source.buf.cast('q')
+    try:
+        view[:] = values if isinstance(values, array) and values.typecode == 'q' else array('q', values)
+
+        # Sort every chunk in place
+        chunks = chunk_bounds(size, chunk_count)
+        pile_counts = list(executor.map(_sort_chunk, [source.name] * chunk_count,
+                                        *zip(*chunks)))
+
+        # Cut all chunks at the same splitters, so range j of every chunk
+        # lands in range j of the output
+        splitters = pick_splitters(view, chunks, chunk_count)
+        cuts = [[start] + [bisect.bisect_left(view, s, start, stop) for s in splitters] + [stop]
+                for start, stop in chunks]
+        jobs = []
+        offset = 0
+        for part in range(chunk_count):
+            bounds = [(chunk_cuts[part], chunk_cuts[part + 1]) for chunk_cuts in cuts]
+            jobs.append(executor.submit(_merge_range, source.name, target.name, bounds, offset))
+            offset += sum(hi - lo for lo, hi in bounds)
+        for job in jobs:
+            job.result()
+
+        result = array('q')
+        result.frombytes(target.buf[:nbytes])
+        return result, ParallelSortStats(workers, chunk_count, max(pile_counts))
+    finally:
+        view.release()
+        if own_executor:
+            executor.shutdown()
+        for block in (source, target):
+            block.close()
+            block.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel patience sort speedup against worker count")
+    parser.add_argument("--size", type=int, default=10_000_000, help="number of random integers to sort")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}), help="worker counts to sweep")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    values = array('q', (rng.randrange(1, 2 ** 62) for _ in range(args.size)))
+
+    start = time.perf_counter()
+    expected = merge_piles(build_piles(values, MIN_RUN))
+    baseline = time.perf_counter() - start
+    print(f"{args.size:,} values, {os.cpu_count()} CPUs, sequential patience sort {baseline:.2f}s")
+
+    print(f"{'workers':>8} {'time (s)':>10} {'speedup':>9} {'chunks':>7} {'max piles':>10}")
+    for workers in args.workers:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            start = time.perf_counter()
+            result, stats = parallel_sort(values, workers, executor)
+            elapsed = time.perf_counter() - start
+        if result.tolist() != expected:
+            raise SystemExit(f"parallel result with {workers} workers does not match")
+        print(f"{workers:>8} {elapsed:>10.2f} {baseline / elapsed:>8.2f}x {stats.chunks:>7} {stats.max_piles:>10,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Replay files: a recorded patience sort run stored for later playback.
+
+A replay holds the input and everything SortTrace records for it: the
+pile layout, the placement of every element (the select, find and place
+steps of the pile phase), the pile every output value was popped from
+(the reconstruction steps) and the seek checkpoints. The step events are
+derived from these exactly as for a freshly recorded run, so nothing is
+recomputed when a replay is opened.
+
+Layout: a fixed header (ending with the recording's SortTrace.counters)
+followed by flat sections in native byte order, each starting on an 8
+byte boundary:
+
+    input          n int64
+    placement      n indices
+    pile_lengths   piles indices
+    pile_offsets   piles indices
+    pile_values    n int64
+    pops           n indices
+    sorted_output  n int64
+    checkpoint widths, pile checkpoints, merge checkpoints (indices)
+
+open_replay() maps the file with mmap and hands out memoryviews of the
+sections, so scrubbing through a replay of tens of millions of events
+only touches the pages that are read.
+"""
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Tuple
+
+from patience_engine import PerfCounters, SortTrace, compact_array, index_typecode
+
+MAGIC = b'PSREPLAY'
+VERSION = 1
+EXTENSION = '.psr'
+# magic, version, byte order, index typecode, n, piles, checkpoint interval,
+# presorted runs, pile checkpoint rows, merge checkpoint rows, pile checkpoint cells,
+# then the counters: SortTrace.COUNTERS and SortTrace.TIMES in seconds
+HEADER = struct.Struct('<8sHcc4xQQQQQQQQQdd')
+ALIGN = 8
+
+
+def _padding(size: int) -> bytes:
+    return bytes(-size % ALIGN)
+
+
+def write_replay(path: str, values, trace: SortTrace):
+    """Write the input values and their recorded trace to path
+
+    The file is written next to path and then moved over it, so a replay
+    that is currently mapped (e.g. saved again under its own name) is
+    never truncated under its readers.
+    """
+    n = len(values)
+    if len(trace.placement) != n:
+        raise ValueError("trace was recorded for a different input")
+    values = compact_array(values)
+    if isinstance(values, list):
+        raise ValueError("Replay files hold runs over 64-bit integers only.")
+
+    index_code = index_typecode(n)
+    widths = array(index_code, (len(row) for row in trace.pile_checkpoints))
+    sections = [
+        values,
+        compact_array(trace.placement, index_code),
+        compact_array(trace.pile_lengths, index_code),
+        compact_array(trace.pile_offsets, index_code),
+        compact_array(trace.pile_values),
+        compact_array(trace.pops, index_code),
+        compact_array(trace.sorted_output),
+        widths,
+    ]
+    header = HEADER.pack(MAGIC, VERSION, b'<' if sys.byteorder == 'little' else b'>', index_code.encode(),
+                         n, trace.pile_count, trace.checkpoint_interval, trace.run_count,
+                         len(trace.pile_checkpoints), len(trace.merge_checkpoints), sum(widths),
+                         *(trace.counters[name] for name in SortTrace.COUNTERS),
+                         *(trace.counters.time(name) for name in SortTrace.TIMES))
+    fd, temp_path = tempfile.mkstemp(prefix='.replay-', suffix=EXTENSION,
+                                     dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            _write_sections(file, header, sections, trace, index_code)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _write_sections(file, header, sections, trace, index_code):
+    """Write the header, the flat sections and the checkpoint rows, each padded"""
+    file.write(header)
+    for section in sections:
+        data = memoryview(section).cast('B')
+        file.write(data)
+        file.write(_padding(len(data)))
+    for rows in (trace.pile_checkpoints, trace.merge_checkpoints):
+        size = 0
+        for row in rows:
+            data = memoryview(compact_array(row, index_code)).cast('B')
+            file.write(data)
+            size += len(data)
+        file.write(_padding(size))
+
+
+def open_replay(path: str) -> Tuple[memoryview, SortTrace]:
+    """Map the replay file at path, return its (input, trace) as memoryviews"""
+    with open(path, 'rb') as file:
+        head = file.read(HEADER.size)
+        if len(head) < HEADER.size or not head.startswith(MAGIC):
+            raise ValueError(f"{path} is not a patience sort replay file.")
+        (_, version, byteorder, index_code, n, pile_count, interval, run_count,
+         pile_rows, merge_rows, pile_cells, *stored) = HEADER.unpack(head)
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay file version {version}.")
+        if byteorder != (b'<' if sys.byteorder == 'little' else b'>'):
+            raise ValueError("The replay file was written on a machine of the other byte order.")
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    counters = PerfCounters()
+    for name, count in zip(SortTrace.COUNTERS, stored):
+        counters.add(name, count)
+    for name, seconds in zip(SortTrace.TIMES, stored[len(SortTrace.COUNTERS):]):
+        counters.add_time(name, seconds)
+
+    index_code = index_code.decode()
+    buffer = memoryview(mapped)
+    offset = HEADER.size
+
+    def section(typecode, count):
+        nonlocal offset
+        size = count * array(typecode).itemsize
+        if offset + size > len(buffer):
+            raise ValueError(f"{path} is truncated.")
+        view = buffer[offset:offset + size].cast(typecode)
+        offset += size + len(_padding(size))
+        return view
+
+    values = section('q', n)
+    fields = {
+        'placement': section(index_code, n),
+        'pile_lengths': section(index_code, pile_count),
+        'pile_offsets': section(index_code, pile_count),
+        'pile_values': section('q', n),
+        'pops': section(index_code, n),
+        'sorted_output': section('q', n),
+        'checkpoint_interval': interval,
+        'run_count': run_count,
+    }
+    widths = section(index_code, pile_rows)
+    flat = section(index_code, pile_cells)
+    rows = []
+    start = 0
+    for width in widths:
+        rows.append(flat[start:start + width])
+        start += width
+    fields['pile_checkpoints'] = rows
+    flat = section(index_code, merge_rows * pile_count)
+    fields['merge_checkpoints'] = [flat[row * pile_count:(row + 1) * pile_count] for row in range(merge_rows)]
+    return values, SortTrace.from_fields(counters, **fields)
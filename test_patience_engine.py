@@ -0,0 +1,238 @@
+"""Consistency checks for the recorded run and the step engine.
+
+The NumPy kernels must record exactly the trace of the pure Python pass,
+and seeking to any position must restore exactly the state that stepping
+there produces.
+"""
+import heapq
+import random
+from array import array
+
+import pytest
+
+from patience_engine import (
+    PHASE_IDLE, STAGE_CANCELLED, STAGE_DONE, LDSWorker, OnlinePatienceSorter, PatienceSortEngine, RunCounter,
+    SortTrace, TraceCache, build_piles, find_runs, fingerprint, longest_decreasing_subsequence, nsmallest, patience_sort)
+
+
+def inputs(n: int, seed: int):
+    """(name, values) of the input shapes the pile pass treats differently"""
+    rng = random.Random(seed)
+    yield 'random', [rng.randint(-10 ** 9, 10 ** 9) for _ in range(n)]
+    yield 'few distinct', [rng.randint(1, 5) for _ in range(n)]
+    yield 'ascending', list(range(n))
+    yield 'descending', list(range(n, 0, -1))
+    nearly = list(range(n))
+    for _ in range(n // 20):
+        i, j = rng.randrange(n), rng.randrange(n)
+        nearly[i], nearly[j] = nearly[j], nearly[i]
+    yield 'nearly sorted', nearly
+    yield 'runs', [value for start in range(0, n, 40) for value in
+                   sorted((rng.randint(0, 99) for _ in range(min(40, n - start))), reverse=start % 80 == 0)]
+
+
+def trace_fields(trace: SortTrace) -> dict:
+    fields = {}
+    for name in SortTrace.FIELDS:
+        value = getattr(trace, name)
+        if name in ('pile_checkpoints', 'merge_checkpoints'):
+            value = [list(row) for row in value]
+        elif not isinstance(value, int):
+            value = list(value)
+        fields[name] = value
+    fields['counters'] = [trace.counters[name] for name in SortTrace.COUNTERS]
+    return fields
+
+
+@pytest.mark.parametrize('n', [0, 1, 2, 17, 500, 5000])
+@pytest.mark.parametrize('checkpoint_interval', [1, 7, 1024])
+def test_numpy_trace_matches_python(n, checkpoint_interval):
+    pytest.importorskip('numpy')
+    for name, values in inputs(n, seed=n):
+        values = array('q', values)
+        python = SortTrace(values, checkpoint_interval, use_numpy=False)
+        vectorized = SortTrace(values, checkpoint_interval, use_numpy=True)
+        assert trace_fields(vectorized) == trace_fields(python), name
+
+
+def test_find_runs():
+    values = [1, 2, 3, 5, 4, 3, 2, 2, 1]
+    # The pair breaking a run is skipped: 2, 2 is neither part of 4, 3, 2 nor of 2, 1
+    assert find_runs(values, 1) == [(0, 4, False), (4, 7, True), (7, 9, True)]
+    assert find_runs(values, 3) == [(0, 4, False), (4, 7, True)]
+    assert find_runs([3, 2, 1, 1, 2], 1, descending=False) == [(0, 1, False), (1, 2, False), (2, 5, False)]
+    assert find_runs([], 1) == []
+    assert find_runs([7], 1) == [(0, 1, False)]
+
+
+@pytest.mark.parametrize('step', [1, 2, 5, 64])
+def test_run_counter_scans_piecewise(step):
+    rng = random.Random(step)
+    for _ in range(200):
+        values = [rng.randint(0, 3) for _ in range(rng.randint(0, 80))]
+        counter = RunCounter(values, 2)
+        for stop in range(0, len(values), step):
+            counter.scan(stop)
+        assert counter.run_count <= len(find_runs(values, 2))
+        counter.scan(len(values))
+        assert counter.runs == find_runs(values, 2)
+
+
+def engine_state(engine: PatienceSortEngine) -> tuple:
+    # The current element only means something while an element is in flight
+    element = engine.current_element if engine.current_phase != PHASE_IDLE else None
+    return (engine.position, list(engine.pile_sizes), list(engine.merge_taken), engine.sorted_count,
+            engine.current_index, element, engine.target_pile, engine.current_phase,
+            engine.piles_complete, engine.merge_started, engine.is_finished)
+
+
+@pytest.mark.parametrize('n', [1, 2, 10, 60])
+@pytest.mark.parametrize('merge_limit', [None, 0, 5])
+def test_seek_matches_step(n, merge_limit):
+    for name, values in inputs(n, seed=n):
+        trace = SortTrace(values, checkpoint_interval=3)
+        stepped = PatienceSortEngine(values)
+        stepped.set_trace(trace)
+        stepped.set_merge_limit(merge_limit)
+        states = [engine_state(stepped)]
+        while not stepped.is_finished:
+            stepped.step()
+            states.append(engine_state(stepped))
+        assert len(states) == stepped.total_steps + 1, name
+
+        sought = PatienceSortEngine(values)
+        sought.set_trace(trace)
+        sought.set_merge_limit(merge_limit)
+        for position in reversed(range(len(states))):
+            sought.seek(position)
+            assert engine_state(sought) == states[position], (name, position)
+            if position < stepped.total_steps:
+                # Stepping on from a restored state continues the same run
+                sought.step()
+                assert engine_state(sought) == states[position + 1], (name, position)
+
+
+def test_lds_worker():
+    rng = random.Random(17)
+    values = array('q', (rng.randint(0, 1000) for _ in range(3000)))
+    worker = LDSWorker(values, report_every=100)
+    worker.start()
+    events = [worker.events.get(timeout=5)]
+    while events[-1].stage not in (STAGE_DONE, STAGE_CANCELLED):
+        events.append(worker.events.get(timeout=5))
+    assert events[-1].stage == STAGE_DONE
+    assert events[-1].lds == longest_decreasing_subsequence(values)
+    assert [event.done for event in events[:-1]] == list(range(100, 3001, 100))
+
+    worker = LDSWorker(values, report_every=100)
+    worker.pause()
+    worker.start()
+    worker.cancel()
+    worker.join(5)
+    assert worker.events.get(timeout=5).stage == STAGE_CANCELLED
+
+
+@pytest.mark.parametrize('min_run', [0, 4])
+@pytest.mark.parametrize('reverse', [False, True])
+def test_patience_sort_is_stable(min_run, reverse):
+    rng = random.Random(min_run)
+    for n in (0, 1, 30, 2000):
+        # Few distinct keys, and runs of equal keys, so stability shows
+        items = [(rng.randint(0, 9) if rng.random() < 0.7 else i // 50, i) for i in range(n)]
+        key = lambda item: item[0]
+        assert patience_sort(items, key=key, reverse=reverse, min_run=min_run) == \
+            sorted(items, key=key, reverse=reverse)
+        assert patience_sort(items, reverse=reverse, min_run=min_run) == sorted(items, reverse=reverse)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_online_sorter_matches_heapq(seed):
+    rng = random.Random(seed)
+    sorter = OnlinePatienceSorter(rng.randint(0, 50) for _ in range(rng.randint(0, 100)))
+    heap = list(sorter.iter_sorted())
+    heapq.heapify(heap)
+    for _ in range(3000):
+        if rng.random() < 0.55 or not heap:
+            value = rng.randint(0, 50)
+            sorter.push(value)
+            heapq.heappush(heap, value)
+        else:
+            assert sorter.peek_min() == heap[0]
+            assert sorter.pop_min() == heapq.heappop(heap)
+        assert len(sorter) == len(heap)
+    assert list(sorter.iter_sorted()) == sorted(heap)
+    assert [sorter.pop_min() for _ in range(len(heap))] == sorted(heap)
+    with pytest.raises(IndexError):
+        sorter.pop_min()
+
+
+def test_online_sorter_extend_counts_values_placed_before_an_error():
+    def values():
+        yield from (3, 1, 2)
+        raise RuntimeError('stream broke')
+
+    sorter = OnlinePatienceSorter([5])
+    with pytest.raises(RuntimeError):
+        sorter.extend(values())
+    assert len(sorter) == 4
+    assert [sorter.pop_min() for _ in range(4)] == [1, 2, 3, 5]
+
+
+@pytest.mark.parametrize('min_run', [0, 4])
+def test_sorted_slice_and_iter_range(min_run):
+    for name, values in inputs(300, seed=20):
+        piles = build_piles(values, min_run)
+        ordered = sorted(values)
+        for start, stop in [(0, 0), (0, 1), (5, 40), (250, 300), (290, 1000), (40, 5)]:
+            assert piles.sorted_slice(start, stop) == ordered[start:stop], (name, start, stop)
+        for low, high in [(ordered[0], ordered[-1] + 1), (ordered[10], ordered[200]),
+                          (ordered[50], ordered[50]), (ordered[-1] + 1, ordered[-1] + 9), (-10 ** 10, 0)]:
+            assert list(piles.iter_range(low, high)) == [v for v in ordered if low <= v < high], (name, low, high)
+        assert nsmallest(values, 7, min_run) == ordered[:7]
+
+
+def test_negative_bounds():
+    assert nsmallest([3, 1, 2], -1) == heapq.nsmallest(-1, [3, 1, 2]) == []
+    assert nsmallest([3, 1, 2], 0) == []
+    piles = build_piles([3, 1, 2])
+    for start, stop in [(-1, 2), (0, -1)]:
+        with pytest.raises(ValueError, match='non-negative'):
+            piles.sorted_slice(start, stop)
+
+
+def test_trace_cache_evicts_least_recently_used():
+    traces = {f'k{n}': SortTrace(list(range(n, 0, -1))) for n in (50, 60, 70)}
+    sizes = {key: trace.memory_usage()['total'] for key, trace in traces.items()}
+    cache = TraceCache(max_bytes=sizes['k60'] + sizes['k70'])
+    cache.put('k50', traces['k50'])
+    cache.put('k60', traces['k60'])
+    assert cache.size == sizes['k50'] + sizes['k60']
+    assert cache.get('k50') is traces['k50']  # k60 is now the least recently used
+    cache.put('k70', traces['k70'])
+    assert cache.get('k60') is None
+    assert set(cache.entries) == {'k50', 'k70'}
+    assert cache.size == sizes['k50'] + sizes['k70']
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 1, 'entries': 2,
+                             'bytes': sizes['k50'] + sizes['k70']}
+
+    # Putting a key again replaces its bytes instead of adding them
+    cache.put('k50', traces['k50'])
+    assert cache.size == sizes['k50'] + sizes['k70'] and len(cache) == 2
+    # A trace larger than the whole cache is not kept and evicts nothing
+    big = SortTrace(list(range(2000)))
+    cache.put('big', big)
+    assert 'big' not in cache.entries and len(cache) == 2
+    cache.clear()
+    assert cache.size == 0 and len(cache) == 0
+
+
+def test_engine_reuses_cached_trace():
+    cache = TraceCache()
+    values = array('q', [5, 3, 8, 1, 9, 2, 7])
+    first = PatienceSortEngine(values, cache=cache)
+    first.sort()
+    second = PatienceSortEngine(array('q', values), cache=cache)
+    second.sort()
+    assert second.trace is first.trace
+    assert fingerprint(values) in cache.entries
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,60 @@
+"""The NumPy and int() text parsers must accept and reject the same input."""
+import random
+
+import pytest
+
+import patience_io
+from patience_io import iter_chunks, parse_items, parse_text
+
+
+def parse_both(monkeypatch, text: str):
+    """(NumPy result, int() result) of parse_text, a ValueError counting as None"""
+    results = []
+    for min_bytes in (0, float('inf')):
+        monkeypatch.setattr(patience_io, 'NUMPY_MIN_BYTES', min_bytes)
+        try:
+            results.append(list(parse_text(text)))
+        except ValueError:
+            results.append(None)
+    return results
+
+
+@pytest.mark.parametrize('text', ['4 - 1', '- 4', '4 -', '4 +', '+ 4', '7, -, 8', '-', '1 2 -\n3'])
+def test_lone_sign_is_rejected_by_both_parsers(monkeypatch, text):
+    pytest.importorskip('numpy')
+    numpy_result, int_result = parse_both(monkeypatch, text + ' 1' * 100)
+    assert numpy_result is None
+    assert int_result is None
+
+
+def test_parsers_agree_on_signed_integers(monkeypatch):
+    pytest.importorskip('numpy')
+    rng = random.Random(10)
+    tokens = [f"{rng.choice(['', '+', '-'])}{rng.randint(0, 10 ** 12)}" for _ in range(5000)]
+    text = ''.join(token + rng.choice([' ', ',', ';', '\t', '\n', ', ']) for token in tokens)
+    numpy_result, int_result = parse_both(monkeypatch, text)
+    assert numpy_result == int_result == [int(token) for token in tokens]
+
+
+@pytest.mark.parametrize('chunk_size', [7, 10001, 1 << 16])
+def test_lone_sign_in_a_text_file(tmp_path, chunk_size):
+    path = tmp_path / 'values.txt'
+    path.write_text('1 ' * 40000 + '7 - 8 ' + '1 ' * 40000)
+    with pytest.raises(ValueError):
+        for _ in iter_chunks(str(path), chunk_size=chunk_size):
+            pass
+
+
+def test_parse_items_uses_every_separator():
+    assert parse_items('pear;apple\tfig  kiwi,plum\nlime') == ['pear', 'apple', 'fig', 'kiwi', 'plum', 'lime']
+    assert parse_items('2.5; 1\t-3e2\n4') == [2.5, 1, -300.0, 4]
+
+
+@pytest.mark.parametrize('text', ['1, 2, 3, x, 5', '1.5 2.5 3.5 4,5 nope'])
+def test_parse_items_rejects_a_stray_word_among_numbers(text):
+    with pytest.raises(ValueError, match='is not a number'):
+        parse_items(text)
+
+
+def test_parse_items_keeps_numbers_among_words_as_words():
+    assert parse_items('apple, 2, banana, cherry') == ['apple', '2', 'banana', 'cherry']
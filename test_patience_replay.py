@@ -0,0 +1,89 @@
+"""Replay files must give back exactly the run that was recorded.
+
+A replay is memory mapped, so the trace read back is built over read-only
+memoryviews; the same must hold for any other read-only input buffer.
+"""
+import os
+from array import array
+
+import pytest
+
+from patience_engine import PatienceSortEngine, SortTrace
+from patience_replay import open_replay, write_replay
+from test_patience_engine import engine_state, inputs, trace_fields
+
+
+def record(values) -> SortTrace:
+    return SortTrace(values, checkpoint_interval=7)
+
+
+@pytest.mark.parametrize('n', [0, 1, 300])
+def test_replay_round_trip(tmp_path, n):
+    for name, values in inputs(n, seed=24):
+        values = array('q', values)
+        trace = record(values)
+        path = str(tmp_path / f'{name}.psr')
+        write_replay(path, values, trace)
+        replayed_values, replayed = open_replay(path)
+        assert list(replayed_values) == list(values), name
+        assert trace_fields(replayed) == trace_fields(trace), name
+        assert replayed.comparisons == trace.comparisons, name  # derived again from the placement
+        for timer in SortTrace.TIMES:
+            assert replayed.counters.time(timer) == trace.counters.time(timer), name
+
+
+def test_replay_plays_back_like_the_recording(tmp_path):
+    values = array('q', next(inputs(60, seed=5))[1])
+    path = str(tmp_path / 'run.psr')
+    write_replay(path, values, record(values))
+    recorded = PatienceSortEngine(values)
+    replayed_values, trace = open_replay(path)
+    replayed = PatienceSortEngine(replayed_values)
+    replayed.set_trace(trace)
+    for position in (recorded.total_steps, 0, 100, 3 * len(values) + 5):
+        recorded.seek(position)
+        replayed.seek(position)
+        assert engine_state(replayed) == engine_state(recorded), position
+
+
+def test_save_over_an_open_replay(tmp_path):
+    values = array('q', next(inputs(500, seed=3))[1])
+    path = str(tmp_path / 'run.psr')
+    write_replay(path, values, record(values))
+    mapped_values, mapped = open_replay(path)
+    expected = trace_fields(mapped)
+
+    # Saving the mapped run under its own name must not truncate the mapping it is read from
+    write_replay(path, mapped_values, mapped)
+    assert trace_fields(mapped) == expected
+    assert list(mapped_values) == list(values)
+    _, reopened = open_replay(path)
+    assert trace_fields(reopened) == expected
+    assert [name for name in os.listdir(tmp_path)] == ['run.psr']  # no temporary file left behind
+
+
+def test_open_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.psr'
+    path.write_bytes(b'1 2 3\n' * 100)
+    with pytest.raises(ValueError, match='not a patience sort replay'):
+        open_replay(str(path))
+
+    values = array('q', range(100, 0, -1))
+    write_replay(str(path), values, record(values))
+    path.write_bytes(path.read_bytes()[:-100])
+    with pytest.raises(ValueError, match='truncated'):
+        open_replay(str(path))
+
+
+@pytest.mark.parametrize('use_numpy', [False, True])
+def test_trace_over_a_read_only_buffer(use_numpy):
+    if use_numpy:
+        pytest.importorskip('numpy')
+    for name, values in inputs(5000, seed=8):
+        data = bytes(array('q', values))
+        view = memoryview(data).cast('q')
+        assert view.readonly
+        trace = SortTrace(view, use_numpy=use_numpy)
+        assert bytes(view) == data, name  # the input is never written to
+        assert list(trace.sorted_output) == sorted(values), name
+        assert trace_fields(trace) == trace_fields(SortTrace(array('q', values), use_numpy=use_numpy)), name